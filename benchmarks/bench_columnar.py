@@ -0,0 +1,54 @@
+''' Memory and throughput of the dict Dataset versus ColumnarDataset.
+    Usage: python benchmarks/bench_columnar.py [--frames 100000] [--labels 40]
+'''
+import argparse, random, tracemalloc
+from common import Timer
+from dataset import Dataset
+from columnar import ColumnarDataset
+
+
+def video_histogram(ds):
+    ''' What a per-video label histogram costs on the dict engine. '''
+    hist = {}
+    for name, labels in ds.frames.items():
+        video = hist.setdefault(name.rsplit("_", 1)[0], {})
+        for k, v in labels.items():
+            video[k] = video.get(k, 0) + v
+    return hist
+
+
+def fill(engine, keys, rows):
+    tracemalloc.start()
+    with Timer() as t:
+        ds = engine(list(keys))
+        for name, labels in rows:
+            ds.add_frame(name, dict(labels))
+        ds.ops = []
+    mem = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ds, t.elapsed, mem
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=100000)
+    parser.add_argument("--labels", type=int, default=40)
+    args = parser.parse_args()
+    keys = [f"label{i}" for i in range(args.labels)]
+    rows = [(f"video{i % 50}_{i}", {k: random.randint(1, 3) for k in random.sample(keys, 3)}) for i in range(args.frames)]
+    print(f"{'engine':>16} {'MB':>8} {'add/s':>10} {'per-video ms':>13} {'by label ms':>12} {'AND query ms':>13}")
+    for engine in (Dataset, ColumnarDataset):
+        ds, elapsed, mem = fill(engine, keys, rows)
+        with Timer() as stats:
+            ds.video_histogram() if engine is ColumnarDataset else video_histogram(ds)
+        with Timer() as bylabel:
+            for k in keys:
+                ds.get_frames_for_label(k)
+        with Timer() as query:
+            ds.query(all=keys[:2], none=keys[2:3])
+        print(f"{engine.__name__:>16} {mem/1024**2:>8.1f} {args.frames/elapsed:>10.0f} {1000*stats.elapsed:>13.2f} "
+              f"{1000*bylabel.elapsed:>12.2f} {1000*query.elapsed:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
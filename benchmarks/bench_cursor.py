@@ -0,0 +1,49 @@
+''' Milliseconds per step of the old seek+read path versus FrameCursor for several jump sizes.
+    Usage: python benchmarks/bench_cursor.py [--video clip.mp4] [--steps 40]
+'''
+import argparse, os, tempfile
+import cv2
+from common import make_test_video, Timer
+from cursor import FrameCursor
+from videoindex import loadIndex
+
+
+def seek_read(cap, idx):
+    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    return cap.read()
+
+
+def run(video, jump, steps, useCursor, index=None):
+    cap = cv2.VideoCapture(video)
+    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cursor = FrameCursor(cap, index=index)
+    idx, n = 0, 0
+    with Timer() as t:
+        while n < steps and idx < length:
+            if useCursor:
+                cursor.read(idx)
+            else:
+                seek_read(cap, idx)
+            idx += jump
+            n += 1
+    cap.release()
+    return 1000 * t.elapsed / max(n, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--video", default=None)
+    parser.add_argument("--steps", type=int, default=40)
+    args = parser.parse_args()
+    video = args.video or make_test_video(os.path.join(tempfile.gettempdir(), "vfs_bench.mp4"), nframes=3000)
+    index = loadIndex(video)
+    print(f"{'jump':>6} {'seek ms/step':>14} {'cursor ms/step':>16} {'indexed ms/step':>17}")
+    for jump in (1, 5, 30, 300):
+        old = run(video, jump, args.steps, False)
+        new = run(video, jump, args.steps, True)
+        indexed = run(video, jump, args.steps, True, index)
+        print(f"{jump:>6} {old:>14.2f} {new:>16.2f} {indexed:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
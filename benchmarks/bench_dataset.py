@@ -0,0 +1,41 @@
+''' Latency of one Dataset.save after a single add_frame, full data.json rewrite versus journal append.
+    Usage: python benchmarks/bench_dataset.py [--sizes 1000 10000 100000]
+'''
+import argparse, random, tempfile
+from common import Timer
+from dataset import Dataset
+
+
+def build(n, keys):
+    ds = Dataset(list(keys))
+    for i in range(n):
+        ds.add_frame(f"video_{i}", {k: random.randint(1, 3) for k in random.sample(keys, 2)})
+    ds.ops = []
+    return ds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--saves", type=int, default=20)
+    args = parser.parse_args()
+    keys = [f"label{i}" for i in range(20)]
+    print(f"{'frames':>8} {'rewrite ms':>12} {'journal ms':>12}")
+    for n in args.sizes:
+        ds = build(n, keys)
+        with tempfile.TemporaryDirectory() as folder:
+            ds.compact(folder)
+            with Timer() as full:
+                for i in range(args.saves):
+                    ds.add_frame(f"video_{i}", {keys[0]: 1})
+                    ds.compact(folder)
+            with Timer() as journal:
+                for i in range(args.saves):
+                    ds.add_frame(f"video_{i}", {keys[1]: 1})
+                    ds.save(folder)
+            assert Dataset.load(folder, keys).frames == ds.frames
+        print(f"{n:>8} {1000*full.elapsed/args.saves:>12.2f} {1000*journal.elapsed/args.saves:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+''' Decode throughput of the decoder backends on the same generated clips: sequential frames per
+    second and milliseconds per random access read, for OpenCV and for PyAV with single threaded,
+    multithreaded and multithreaded reduced size RGB output. PyAV rows are skipped when it is not installed.
+    Usage: python benchmarks/bench_decode.py [--videos a.mp4 ...] [--frames 600] [--random 60]
+'''
+import argparse, os, random, tempfile
+from common import make_test_video, Timer
+from decoders import openDecoder, av
+from videoindex import loadIndex
+
+CONFIGS = [
+    ("opencv", "opencv", {}),
+    ("pyav 1 thread", "pyav", {"threads": 1, "threadType": "SLICE"}),
+    ("pyav threaded", "pyav", {"threads": 0, "threadType": "AUTO"}),
+    ("pyav rgb 1/2", "pyav", {"threads": 0, "threadType": "AUTO", "format": "rgb24", "scale": 0.5}),
+]
+
+
+def run(video, backend, options, frames, nrandom):
+    index = loadIndex(video)
+    decoder = openDecoder(video, backend, index=index, **options)
+    n = min(frames, decoder.length)
+    with Timer() as seq:
+        for i in range(n):
+            decoder.read(i)
+    rng = random.Random(0)
+    order = [rng.randrange(decoder.length) for _ in range(nrandom)]
+    with Timer() as rnd:
+        for i in order:
+            decoder.read(i)
+    decoder.release()
+    return n / seq.elapsed, 1000 * rnd.elapsed / max(nrandom, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", nargs="+")
+    parser.add_argument("--frames", type=int, default=600, help="frames decoded sequentially per clip")
+    parser.add_argument("--random", type=int, default=60, help="random access reads per clip")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.videos or [make_test_video(os.path.join(tmp, "clip720.mp4"), nframes=900),
+                                 make_test_video(os.path.join(tmp, "clip1080.mp4"), nframes=600, size=(1920, 1080))]
+        print(f"{'video':>14} {'decoder':>14} {'seq fps':>9} {'random ms':>10}")
+        for video in videos:
+            for label, backend, options in CONFIGS:
+                if backend == "pyav" and av is None:
+                    continue
+                fps, ms = run(video, backend, options, args.frames, args.random)
+                print(f"{os.path.basename(video):>14} {label:>14} {fps:>9.1f} {ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
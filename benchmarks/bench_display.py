@@ -0,0 +1,46 @@
+''' Per-frame cost of the old PIL display path versus ImageViewer.loadArray at 1080p and 4K.
+    Runs on the offscreen Qt platform. Usage: python benchmarks/bench_display.py [--repeat 30]
+'''
+import argparse, os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+import numpy as np
+import cv2
+from PIL import Image
+from PyQt5 import QtWidgets
+from common import Timer
+from viewer import ImageViewer
+
+
+def old_path(viewer, frame):
+    frame = frame.astype(np.uint8)
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
+    viewer.loadImagePIL(Image.fromarray(frame))
+
+
+def new_path(viewer, frame):
+    viewer.loadArray(frame, bgr=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    app = QtWidgets.QApplication([])
+    label = QtWidgets.QLabel()
+    label.resize(1200, 800)
+    viewer = ImageViewer(label)
+    print(f"{'size':>10} {'PIL ms':>10} {'loadArray ms':>14}")
+    for name, (w, h) in (("1080p", (1920, 1080)), ("4K", (3840, 2160))):
+        frame = np.random.randint(0, 255, (h, w, 3), np.uint8)
+        row = []
+        for path in (old_path, new_path):
+            path(viewer, frame)   # warm up
+            with Timer() as t:
+                for _ in range(args.repeat):
+                    path(viewer, frame)
+            row.append(1000 * t.elapsed / args.repeat)
+        print(f"{name:>10} {row[0]:>10.2f} {row[1]:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
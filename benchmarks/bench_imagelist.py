@@ -0,0 +1,81 @@
+''' Folder load and filter keystroke latency of the image list: the model/view list against the
+    old QListWidgetItem-per-image list with setRowHidden filtering. Offscreen Qt platform.
+    Usage: python benchmarks/bench_imagelist.py [--sizes 1000 10000 100000] [--old-max 10000]
+'''
+import argparse, os, tempfile
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from PyQt5 import QtWidgets
+from common import Timer
+from imagelist import ImageListModel
+import vfs
+
+QUERY = "video3_12"
+
+
+def makeFolder(folder, n):
+    for i in range(n):
+        open(os.path.join(folder, f"video{i % 7}_{i}.jpg"), "w").close()
+
+
+def configure(view):
+    ''' Same layout settings as qlist_images in vfs.ui. '''
+    view.setLayoutMode(QtWidgets.QListView.Batched)
+    view.setBatchSize(20)
+    view.setUniformItemSizes(True)
+    view.resize(300, 800)
+    view.show()
+
+
+def oldFilter(ls, t):
+    for index in range(ls.count()):
+        ls.setRowHidden(index, t not in ls.item(index).text())
+
+
+def run(app, folder, old):
+    keystrokes = [QUERY[:i] for i in range(1, len(QUERY) + 1)] + [QUERY[:i] for i in range(len(QUERY) - 1, -1, -1)]
+    if old:
+        view = QtWidgets.QListWidget()
+        configure(view)
+        with Timer() as load:
+            for img in vfs.getImages(folder):
+                view.addItem(QtWidgets.QListWidgetItem(img["name"]))
+            app.processEvents()
+        filt = lambda t: oldFilter(view, t)
+    else:
+        view = QtWidgets.QListView()
+        model = ImageListModel()
+        view.setModel(model)
+        configure(view)
+        with Timer() as load:
+            model.setEntries(vfs.getImages(folder))
+            app.processEvents()
+        filt = model.setFilter
+    times = []
+    for t in keystrokes:
+        with Timer() as key:
+            filt(t)
+            app.processEvents()
+        times.append(key.elapsed)
+    view.close()
+    return load.elapsed, sum(times) / len(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--old-max", type=int, default=100000, help="largest size the old list is timed at")
+    args = parser.parse_args()
+    app = QtWidgets.QApplication([])
+    print(f"{'images':>8} {'list':>6} {'load ms':>10} {'key mean ms':>12} {'key max ms':>11}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            makeFolder(folder, n)
+            for old in (True, False):
+                if old and n > args.old_max:
+                    continue
+                load, mean, worst = run(app, folder, old)
+                print(f"{n:>8} {'old' if old else 'model':>6} {1000*load:>10.1f} {1000*mean:>12.2f} {1000*worst:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
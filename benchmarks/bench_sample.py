@@ -0,0 +1,35 @@
+''' Scaling of sample.py over 1, 2, 4 and 8 processes on one long generated clip and on several short ones.
+    Usage: python benchmarks/bench_sample.py [--frames 6000] [--every 10]
+'''
+import argparse, io, os, tempfile
+from contextlib import redirect_stdout
+from common import make_test_video, Timer
+import sample
+
+
+def run(videos, processes, every):
+    with tempfile.TemporaryDirectory() as out:
+        with redirect_stdout(io.StringIO()), Timer() as t:
+            sample.main(["--out", out, "--every", str(every), "--processes", str(processes)] + videos)
+    return t.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=6000)
+    parser.add_argument("--every", type=int, default=10)
+    args = parser.parse_args()
+    tmp = tempfile.gettempdir()
+    long = [make_test_video(os.path.join(tmp, f"vfs_long_{args.frames}.mp4"), nframes=args.frames)]
+    short = [make_test_video(os.path.join(tmp, f"vfs_short_{i}.mp4"), nframes=args.frames // 8) for i in range(8)]
+    print(f"{os.cpu_count()} cpus")
+    print(f"{'processes':>10} {'1 long video s':>16} {'8 short videos s':>18}")
+    base = None
+    for processes in (1, 2, 4, 8):
+        row = (run(long, processes, args.every), run(short, processes, args.every))
+        base = base or row
+        print(f"{processes:>10} {row[0]:>10.1f} x{base[0] / row[0]:<4.1f} {row[1]:>12.1f} x{base[1] / row[1]:<4.1f}")
+
+
+if __name__ == "__main__":
+    main()
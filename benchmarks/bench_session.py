@@ -0,0 +1,51 @@
+''' Milliseconds per clip switch when alternating between videos: reopening the capture every time
+    (the old loadVideo) against the VideoSession pool, each switch showing the frame the clip was left at.
+    Usage: python benchmarks/bench_session.py [--videos a.mp4 b.mp4 ...] [--switches 40]
+'''
+import argparse, os, tempfile
+import cv2
+from common import make_test_video, Timer
+from session import VideoSession
+from videoindex import loadIndex
+
+
+def reopen(path, idx):
+    cap = cv2.VideoCapture(path)
+    loadIndex(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+    ret, frame = cap.read()
+    cap.release()
+    return frame
+
+
+def run(videos, switches, pooled):
+    session = VideoSession(size=len(videos))
+    positions = {v: 0 for v in videos}
+    with Timer() as t:
+        for i in range(switches):
+            video = videos[i % len(videos)]
+            if pooled:
+                clip = session.open(video)
+                clip.prefetcher.get(positions[video])
+            else:
+                reopen(video, positions[video])
+            positions[video] += 5
+    session.close()
+    return 1000 * t.elapsed / switches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--videos", nargs="+")
+    parser.add_argument("--switches", type=int, default=40)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        videos = args.videos or [make_test_video(os.path.join(tmp, f"clip{i}.mp4"), nframes=300) for i in range(4)]
+        for v in videos:
+            loadIndex(v)    # sidecars are built once, not part of a switch
+        print(f"{'videos':>7} {'reopen ms':>10} {'pooled ms':>10}")
+        print(f"{len(videos):>7} {run(videos, args.switches, False):>10.2f} {run(videos, args.switches, True):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+''' Startup of the GUI, each run in a fresh interpreter: time to import vfs, time to the first paint
+    of the window, and time until a folder picked right after startup is listed. --root points at
+    another checkout to compare against it. Offscreen Qt platform.
+    Usage: python benchmarks/bench_startup.py [--runs 5] [--images 20000] [--root path/to/checkout]
+'''
+import argparse, json, os, statistics, subprocess, sys, tempfile
+from common import ROOT
+
+# started with: root folder
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+root, folder = sys.argv[1], sys.argv[2]
+sys.path.insert(0, root)
+import vfs
+imported = time.perf_counter()
+from PyQt5 import QtCore, QtWidgets
+app = QtWidgets.QApplication([])
+marks = {}
+
+class FirstPaint(QtCore.QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint and "paint" not in marks:
+            marks["paint"] = time.perf_counter()
+        return False
+
+painted = FirstPaint()
+app.installEventFilter(painted)
+vfs.QtWidgets.QFileDialog.getExistingDirectory = staticmethod(lambda *a, **k: folder)
+w = vfs.Iwindow(None)
+# the folder is picked as soon as the event loop runs, like a user clicking right away
+QtCore.QTimer.singleShot(0, w.selectDir)
+
+def poll():
+    if "paint" in marks and len(w.imageModel) > 0:
+        marks["folder"] = time.perf_counter()
+        app.quit()
+
+timer = QtCore.QTimer()
+timer.timeout.connect(poll)
+timer.start(2)
+QtCore.QTimer.singleShot(60000, app.quit)
+app.exec_()
+print(json.dumps({"import": imported - t0, "paint": marks.get("paint", float("nan")) - t0, "folder": marks.get("folder", float("nan")) - t0}))
+"""
+
+
+def makeFolder(folder, n):
+    for i in range(n):
+        open(os.path.join(folder, f"video{i % 7}_{i}.jpg"), "w").close()
+
+
+def run(root, folder):
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    out = subprocess.run([sys.executable, "-c", CHILD, root, folder], env=env, cwd=root,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--images", type=int, default=20000, help="images in the folder opened at startup")
+    parser.add_argument("--root", default=ROOT, help="checkout whose vfs.py is started")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = os.path.join(tmp, "dataset")
+        os.makedirs(folder)
+        makeFolder(folder, args.images)
+        runs = [run(os.path.abspath(args.root), folder) for _ in range(args.runs)]
+    print(f"{'median of':>10} {'import ms':>10} {'first paint ms':>15} {'folder listed ms':>17}")
+    med = {k: 1000 * statistics.median(r[k] for r in runs) for k in runs[0]}
+    print(f"{args.runs:>10} {med['import']:>10.0f} {med['paint']:>15.0f} {med['folder']:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+''' Helpers shared by the headless benchmark scripts. '''
+import os, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def make_test_video(path, nframes=1200, size=(1280, 720), fps=30, fourcc="mp4v"):
+    ''' Write a synthetic clip with a moving gradient and a frame counter so every frame differs. '''
+    import numpy as np
+    import cv2
+    if os.path.exists(path):
+        return path
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+    xs = np.linspace(0, 255, w, dtype=np.float32)[None, :]
+    ys = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    for i in range(nframes):
+        frame = np.empty((h, w, 3), np.uint8)
+        frame[..., 0] = (xs + i) % 256
+        frame[..., 1] = (ys + 2 * i) % 256
+        frame[..., 2] = (xs + ys + 3 * i) % 256 / 2
+        cv2.putText(frame, str(i), (20, h // 2), cv2.FONT_HERSHEY_SIMPLEX, 4, (255, 255, 255), 8)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class Timer:
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.elapsed = time.perf_counter() - self.t0
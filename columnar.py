@@ -0,0 +1,207 @@
+from collections.abc import Mapping
+import numpy as np
+from dataset import Dataset
+
+COUNT_DTYPE = np.int32                          # per-frame label counts; int16 overflowed on counts typed in the GUI
+COUNT_MIN, COUNT_MAX = int(np.iinfo(COUNT_DTYPE).min), int(np.iinfo(COUNT_DTYPE).max)
+
+
+def grown(counts, shape):
+    ''' Copy of the count matrix enlarged to shape, keeping its column-major layout. '''
+    out = np.zeros(shape, counts.dtype, order="F")
+    out[:counts.shape[0], :counts.shape[1]] = counts
+    return out
+
+
+class FrameView(Mapping):
+    ''' Read-only dict-like view of a ColumnarDataset, so code written against
+        Dataset.frames (name -> {label: count}) keeps working.
+    '''
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getitem__(self, name):
+        return self.dataset.labels_of(name)
+
+    def __contains__(self, name):
+        return name in self.dataset.rows
+
+    def __iter__(self):
+        return iter(list(self.dataset.rows))
+
+    def __len__(self):
+        return len(self.dataset.rows)
+
+
+class ColumnarDataset(Dataset):
+    ''' Dataset engine storing frames as an interned name table and a dense
+        (frames x labels) count matrix instead of one small dict per frame.
+        Totals, per-label and per-video histograms are reductions over the matrix.
+        Same public methods and on-disk format (data.json + journal) as Dataset.
+    '''
+    def __init__(self, keys):
+        self._keys = list(keys)
+        self.nlabels = len(self._keys)
+        self.cols = {k: i for i, k in enumerate(self._keys)}     # label -> column
+        self.labels = list(self._keys)                          # column -> label
+        self.names = []                                         # row -> frame name
+        self.rows = {}                                          # frame name -> row, live frames only
+        self.free = []                                          # rows of removed frames, reused
+        self.videos, self.videoIds = [], {}                     # interned video names
+        # column-major, so per-label scans read contiguous memory; int32 as counts are typed in freely
+        self.counts = np.zeros((1024, max(len(self.labels), 1)), COUNT_DTYPE, order="F")
+        self.videoOf = np.zeros(1024, np.int32)
+        self.alive = np.zeros(1024, bool)
+        self.totals = np.zeros(self.counts.shape[1], np.int64)
+        self.frames = FrameView(self)
+        self.ops = []
+        self.journaled = 0
+
+    @property
+    def keys(self):
+        return {l: int(self.totals[c]) for l, c in self.cols.items()}
+
+    def _column(self, label):
+        if label not in self.cols:
+            self.cols[label] = len(self.labels)
+            self.labels.append(label)
+        col = self.cols[label]
+        if col >= self.counts.shape[1]:
+            grow = max(col + 1, 2 * self.counts.shape[1])
+            self.counts = grown(self.counts, (self.counts.shape[0], grow))
+            self.totals = np.pad(self.totals, (0, grow - self.totals.shape[0]))
+        return col
+
+    def _row(self, name):
+        if name in self.rows:
+            return self.rows[name]
+        if self.free:
+            row = self.free.pop()
+            self.names[row] = name
+        else:
+            row = len(self.names)
+            self.names.append(name)
+            if row >= self.counts.shape[0]:
+                grow = 2 * self.counts.shape[0]
+                self.counts = grown(self.counts, (grow, self.counts.shape[1]))
+                self.videoOf = np.pad(self.videoOf, (0, grow - self.videoOf.shape[0]))
+                self.alive = np.pad(self.alive, (0, grow - self.alive.shape[0]))
+        video = name.rsplit("_", 1)[0]
+        if video not in self.videoIds:
+            self.videoIds[video] = len(self.videos)
+            self.videos.append(video)
+        self.videoOf[row] = self.videoIds[video]
+        self.alive[row] = True
+        self.rows[name] = row
+        return row
+
+    def labels_of(self, name):
+        row = self.counts[self.rows[name]]
+        return {self.labels[c]: int(row[c]) for c in np.flatnonzero(row)}
+
+    def get_ordered(self):
+        return [int(self.totals[self.cols[k]]) for k in self._keys]
+
+    def get_frames_for_label(self, label):
+        if label not in self.cols:
+            return []
+        n = len(self.names)
+        hit = np.flatnonzero(self.alive[:n] & (self.counts[:n, self.cols[label]] > 0))
+        return [self.names[r] for r in hit.tolist()]
+
+    def count_frames_for_label(self, label):
+        if label not in self.cols:
+            return 0
+        n = len(self.names)
+        return int(np.count_nonzero(self.alive[:n] & (self.counts[:n, self.cols[label]] > 0)))
+
+    def query(self, all=(), any=(), none=(), minCount=None):
+        n = len(self.names)
+        counts = self.counts[:n]
+        mask = self.alive[:n].copy()
+        for l in all:
+            mask &= counts[:, self.cols[l]] > 0 if l in self.cols else False
+        if any:
+            cols = [self.cols[l] for l in any if l in self.cols]
+            mask &= (counts[:, cols] > 0).any(axis=1) if cols else False
+        for l in none:
+            if l in self.cols:
+                mask &= counts[:, self.cols[l]] == 0
+        for l, c in (minCount or {}).items():
+            mask &= counts[:, self.cols[l]] >= c if l in self.cols else False
+        return {self.names[r] for r in np.flatnonzero(mask).tolist()}
+
+    def label_histogram(self):
+        ''' Number of frames carrying each label. '''
+        n = len(self.names)
+        present = (self.counts[:n, :len(self.labels)] > 0) & self.alive[:n, None]
+        return dict(zip(self.labels, present.sum(axis=0).tolist()))
+
+    def video_histogram(self):
+        ''' Label totals per source video, {video: {label: count}}. '''
+        n = len(self.names)
+        live = self.alive[:n]
+        videoOf = self.videoOf[:n][live]
+        hist = np.stack([np.bincount(videoOf, weights=self.counts[:n, c][live], minlength=len(self.videos))
+                         for c in range(len(self.labels))], axis=1).astype(np.int64) if len(self.labels) else np.zeros((len(self.videos), 0), np.int64)
+        return {v: dict(zip(self.labels, hist[i].tolist())) for i, v in enumerate(self.videos)}
+
+    def csr(self):
+        ''' The live count matrix as CSR arrays (indptr, indices, data) plus the row names. '''
+        live = np.flatnonzero(self.alive[:len(self.names)])
+        matrix = self.counts[live, :len(self.labels)]
+        nz = matrix != 0
+        indptr = np.concatenate([[0], np.cumsum(nz.sum(axis=1))])
+        indices = np.nonzero(nz)[1]
+        return indptr, indices, matrix[nz], [self.names[r] for r in live.tolist()]
+
+    def add_key(self, name):
+        if name in self._keys:
+            return
+        self._keys.append(name)
+        self._keys.sort()
+        self.nlabels += 1
+        self._column(name)
+        self.ops.append({"op": "key", "name": name})
+
+    def add_frame(self, name, labels):
+        # checked before anything changes, a count the matrix cannot hold must not reach the journal
+        for k, v in labels.items():
+            if not COUNT_MIN <= v <= COUNT_MAX:
+                raise ValueError(f"Count {v} of {k} for {name} is out of range [{COUNT_MIN}, {COUNT_MAX}]")
+        row = self._row(name)
+        self.totals -= self.counts[row]
+        self.counts[row] = 0
+        for k, v in labels.items():
+            col = self._column(k)   # may replace self.counts with a wider copy, so before indexing it
+            self.counts[row, col] = v
+        self.totals += self.counts[row]
+        self.ops.append({"op": "add", "name": name, "labels": labels})
+
+    def remove_frame(self, name):
+        row = self.rows.pop(name)
+        self.totals -= self.counts[row]
+        self.counts[row] = 0
+        self.alive[row] = False
+        self.free.append(row)
+        self.ops.append({"op": "remove", "name": name})
+
+    def reindex(self):
+        pass
+
+    def restore(self, dd):
+        self._keys = dd["keys_list"]
+        self.nlabels = dd["nlabels"]
+        for k in self._keys:
+            self._column(k)
+        for name, labels in dd["frames"].items():
+            self.add_frame(name, labels)
+        self.ops = []
+
+    def snapshot(self):
+        return {
+            "keys": {k: int(self.totals[self.cols[k]]) if k in self.cols else 0 for k in set(self._keys) | set(self.labels)},
+            "frames": {name: self.labels_of(name) for name in self.rows},
+            "keys_list": self._keys,
+            "nlabels": self.nlabels
+        }
@@ -0,0 +1,112 @@
+import time
+import cv2
+from timing import timed
+
+MAX_FORWARD = 120   # upper bound on the number of frames the cursor will decode through instead of seeking
+GUESS_FORWARD = 16  # forward distance decoded through until seek and grab costs have been measured
+
+
+class FrameCursor:
+    ''' Keeps track of where the decoder of a cv2.VideoCapture currently is, so that
+        frames ahead of it are reached by decoding forward instead of seeking.
+        cap.set() on long-GOP footage jumps back to the previous keyframe and decodes
+        up to the target, so for small forward steps grab() is much cheaper. How far
+        "small" goes depends on the GOP, so the measured cost of a seek and of a grab
+        decide, capped by maxForward.
+        With a VideoIndex the cursor knows where the keyframes are and seeks to the one
+        before the target, then decodes forward to exactly the requested frame.
+    '''
+    def __init__(self, cap, maxForward=MAX_FORWARD, index=None):
+        self.cap = cap
+        self.index = index
+        self.maxForward = maxForward                          # forward distance above which we always seek
+        self.position = int(cap.get(cv2.CAP_PROP_POS_FRAMES)) # index of the frame the next read() returns
+        self.grabbed = None                                   # frame grabbed but not yet retrieved
+        self.seekCost, self.grabCost = None, None             # running averages in seconds
+        self.seeks, self.grabs, self.reads = 0, 0, 0
+
+    def shouldGrab(self, gap):
+        if self.position < 0:
+            return False    # where the decoder is is unknown, only a seek gets a known position
+        if gap < 0 or gap > self.maxForward:
+            return False
+        if self.seekCost is None or self.grabCost is None:
+            return gap <= GUESS_FORWARD
+        return gap * self.grabCost < self.seekCost
+
+    @timed("cursor.seek")
+    def seek(self, idx):
+        ''' Move the decoder so that the next read returns frame idx. '''
+        if self.index is not None:
+            return self.seekIndexed(idx)
+        self.grabbed = None
+        gap = idx - self.position
+        if not self.shouldGrab(gap):
+            t0 = time.perf_counter()
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            self.seekCost = average(self.seekCost, time.perf_counter() - t0)
+            self.seeks += 1
+            self.position = idx
+            return True
+        return self.grabTo(idx)
+
+    def seekIndexed(self, idx):
+        ''' Seek using the keyframe index: stay and decode forward when the current position is
+            already in (or just before) the target's GOP, else seek, find out from the frame
+            timestamp where the decoder really landed and decode forward to exactly idx.
+        '''
+        kf = self.index.keyframeBefore(idx)
+        # a seek decodes from kf anyway, so only the frames before kf count against staying
+        if 0 <= self.position <= idx and (self.position >= kf or self.shouldGrab(kf - self.position)):
+            return self.grabTo(idx)
+        # OpenCV's own seek already starts decoding at a keyframe; the index is used to check where
+        # it really landed (from the frame timestamp) and, when it overshot, to seek to the keyframes
+        for start in (idx, kf, self.index.keyframeBefore(kf - 1), 0):
+            t0 = time.perf_counter()
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+            self.seekCost = average(self.seekCost, time.perf_counter() - t0)
+            self.seeks += 1
+            if not self.cap.grab():
+                self.position, self.grabbed = -1, None
+                return False
+            landed = self.index.frameAt(self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+            if landed <= idx:
+                break
+        self.position, self.grabbed = landed + 1, landed
+        return self.grabTo(idx)
+
+    def grabTo(self, idx):
+        ''' Decode forward (without retrieving) until the next frame is idx. '''
+        gap = idx - self.position
+        t0 = time.perf_counter()
+        for _ in range(gap):
+            if not self.cap.grab():
+                self.position, self.grabbed = -1, None     # unknown, force a real seek next time
+                return False
+            self.grabs += 1
+            self.grabbed = self.position
+            self.position += 1
+        if gap > 0:
+            self.grabCost = average(self.grabCost, (time.perf_counter() - t0) / gap)
+        return True
+
+    @timed("cursor.read")
+    def read(self, idx):
+        ''' Decode and return (ret, frame) for frame idx, frame is BGR as given by OpenCV. '''
+        if not self.seek(idx):
+            return False, None
+        if self.grabbed == idx:
+            ret, frame = self.cap.retrieve()
+        else:
+            ret, frame = self.cap.read()
+        self.grabbed = None
+        self.reads += 1
+        self.position = idx + 1 if ret else -1
+        return ret, frame
+
+    def stats(self):
+        return {"seeks": self.seeks, "grabs": self.grabs, "reads": self.reads}
+
+
+def average(old, new, alpha=0.2):
+    return new if old is None else (1 - alpha) * old + alpha * new
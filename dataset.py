@@ -0,0 +1,239 @@
+import os, json, glob, threading
+from timing import timed
+
+COMPACT_EVERY = 2000    # journal ops after which save() rewrites the data.json snapshot
+SOURCES = "videos.json" # video name -> path of the video its frames were sampled from
+
+
+def videoName(path):
+    ''' Name used for frames sampled from the video at path. '''
+    return os.path.basename(path).split(".")[0]
+
+
+def frameName(video, idx):
+    ''' File stem of frame idx of video, as written by saveFrame and the batch sampler. '''
+    return f"{video}_{idx}"
+
+
+def labelNames(folder):
+    ''' Label names given by the key images in the keys folder next to a dataset folder. '''
+    return sorted([os.path.basename(f).replace(".png","").replace(".jpeg","") for f in glob.glob(f"{folder}/../keys/*")])
+
+
+def atomicWrite(path, data):
+    ''' Write data to path through a temporary file, fsync and a rename, so readers never see a
+        partial file and a crash leaves the old file or the new one. data is text (written as
+        UTF-8), bytes, or a function writing to the binary file it is given. The temporary name
+        is unique per process and thread, so concurrent writers of one path do not collide.
+    '''
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.part"
+    try:
+        with open(tmp, "wb") as f:
+            if callable(data):
+                data(f)
+            else:
+                f.write(data.encode() if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def repairJournal(path, size, newline):
+    ''' Cut a journal back to its first size bytes, the complete ops, and give the last one the
+        newline it lost, so the next save appends lines of its own rather than onto a broken one.
+        A read-only journal is left as it is: it still loads, and saving to it fails like any
+        other write to a read-only folder.
+    '''
+    try:
+        with open(path, "rb+") as f:
+            f.truncate(size)
+            if newline:
+                f.seek(size)
+                f.write(b"\n")
+    except OSError:
+        pass
+
+
+def loadSources(folder):
+    ''' Source video paths of the frames in a dataset folder, by video name. '''
+    try:
+        with open(os.path.join(folder, SOURCES)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def saveSources(folder, sources):
+    atomicWrite(os.path.join(folder, SOURCES), json.dumps(sources, indent=1, sort_keys=True))
+
+
+class Dataset:
+    ''' Labels of the sampled frames of a folder.
+        On disk it is a data.json snapshot plus a data.journal of add/remove ops appended
+        since that snapshot; save() only appends the new ops and compacts the journal into
+        the snapshot every COMPACT_EVERY ops. load() reads the snapshot and replays the journal.
+        An inverted index (label -> names of the frames carrying it) is kept up to date by
+        add_frame/remove_frame so label filtering never scans self.frames.
+    '''
+    def __init__(self,keys):
+        self.keys = {k:0 for k in keys}
+        self._keys = keys
+        self.frames = {}
+        self.index = {}         # label -> set of frame names having that label
+        self.nlabels = len(keys)
+        self.ops = []           # ops not yet written to the journal
+        self.journaled = 0      # ops in the journal file since the last snapshot
+
+    def get_ordered(self):
+        return [self.keys[k] for k in self._keys]
+    def get_frames_for_label(self,label):
+        return list(self.index.get(label, ()))
+
+    def count_frames_for_label(self,label):
+        return len(self.index.get(label, ()))
+
+    def query(self,all=(),any=(),none=(),minCount=None):
+        ''' Names of the frames having every label in all, at least one in any, none of the
+            labels in none, and at least minCount[label] instances of each label in minCount.
+        '''
+        sets = [self.index.get(l, set()) for l in all]
+        sets += [self.index.get(l, set()) for l in (minCount or {})]
+        if any:
+            sets.append(set().union(*[self.index.get(l, set()) for l in any]))
+        if sets:
+            sets.sort(key=len)
+            result = set(sets[0]).intersection(*sets[1:])
+        else:
+            result = set(self.frames)
+        for l in none:
+            result -= self.index.get(l, set())
+        for l,n in (minCount or {}).items():
+            result = {f for f in result if self.frames[f].get(l, 0) >= n}
+        return result
+
+    def reindex(self):
+        self.index = {}
+        for name,labels in self.frames.items():
+            for k in labels:
+                self.index.setdefault(k, set()).add(name)
+
+    def add_key(self,name):
+        if name in self._keys:
+            return
+        self._keys.append(name)
+        self._keys.sort()
+        self.nlabels += 1
+        self.keys[name] = 0
+        self.ops.append({"op": "key", "name": name})
+
+    def add_frame(self,name,labels):
+        if name in self.frames:
+            currentLabels = self.frames[name]
+            for k,v in currentLabels.items():
+                self.keys[k] -= v
+                self.index[k].discard(name)
+
+        for k,v in labels.items():
+            self.keys[k] += v
+            self.index.setdefault(k, set()).add(name)
+        self.frames[name] = labels
+        self.ops.append({"op": "add", "name": name, "labels": labels})
+    def remove_frame(self,name):
+        for k,v in self.frames[name].items():
+            self.keys[k] -= v
+            self.index[k].discard(name)
+        self.frames.pop(name)
+        self.ops.append({"op": "remove", "name": name})
+
+    def apply(self,op):
+        ''' Replay a journal op. Ops are idempotent, replaying one already in the snapshot is harmless. '''
+        if op["op"] == "add":
+            self.add_frame(op["name"], op["labels"])
+        elif op["op"] == "remove":
+            if op["name"] in self.frames:
+                self.remove_frame(op["name"])
+        elif op["op"] == "key":
+            self.add_key(op["name"])
+
+    @classmethod
+    def load(cls,folder,names):
+        f = f"{folder}/data.json"
+        dataset = cls(names)
+        if os.path.exists(f):
+            with open(f"{folder}/data.json") as f:
+                dd = json.load(f)
+            dataset.restore(dd)
+        journal = f"{folder}/data.journal"
+        if os.path.exists(journal):
+            good, torn, newline = 0, False, False       # bytes of complete ops
+            with open(journal, "rb") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        torn = True     # last line of a crashed write
+                        break
+                    dataset.apply(op)
+                    dataset.journaled += 1
+                    good += len(line)
+                    newline = not line.endswith(b"\n")
+            if torn or newline:
+                repairJournal(journal, good, newline)
+        dataset.ops = []
+        return dataset
+
+    def restore(self,dd):
+        ''' Take the state of a data.json snapshot. '''
+        self.frames = dd["frames"]
+        self.nlabels = dd["nlabels"]
+        self.keys = dd["keys"]
+        self._keys = dd["keys_list"]
+        self.reindex()
+
+    @timed("dataset.save")
+    def save(self,folder):
+        journal = f"{folder}/data.journal"
+        if not os.path.exists(f"{folder}/data.json") or self.journaled + len(self.ops) >= COMPACT_EVERY:
+            self.compact(folder)
+            return
+        if not self.ops:
+            return
+        with open(journal, "a") as f:
+            f.write("".join(json.dumps(op) + "\n" for op in self.ops))
+        self.journaled += len(self.ops)
+        self.ops = []
+
+    def snapshot(self):
+        ''' The full state in the data.json layout. '''
+        dataset = {
+            "keys": self.keys,
+            "frames": self.frames,
+            "keys_list": self._keys,
+            "nlabels": self.nlabels
+        }
+        keys = {}
+        for f,v in self.frames.items():
+            for k,v2 in v.items():
+                if k in keys:
+                    keys[k] += v2
+                else:
+                    keys[k] = v2
+        for k in self._keys:
+            if k not in keys:
+                keys[k] = 0
+        dataset["keys"] = keys
+        self.keys = keys
+        return dataset
+
+    def compact(self,folder):
+        ''' Rewrite the full data.json snapshot and start an empty journal. '''
+        atomicWrite(f"{folder}/data.json", json.dumps(self.snapshot(),indent=4))
+        # only once the snapshot is in place; a crash in between just replays ops already in it
+        if os.path.exists(f"{folder}/data.journal"):
+            os.remove(f"{folder}/data.journal")
+        self.journaled = 0
+        self.ops = []
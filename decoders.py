@@ -0,0 +1,173 @@
+import os, time
+import cv2
+from cursor import FrameCursor, GUESS_FORWARD, average
+from timing import timed, stage
+try:
+    import av
+except ImportError:     # optional, only the pyav backend needs it
+    av = None
+
+DECODER = os.environ.get("VFS_DECODER", "opencv")              # backend of the GUI: opencv or pyav
+DECODE_THREADS = int(os.environ.get("VFS_DECODE_THREADS", 0))  # pyav decoder threads, 0 lets FFmpeg choose
+THREAD_TYPE = os.environ.get("VFS_DECODE_THREADING", "AUTO")   # pyav threading: SLICE, FRAME or AUTO (both)
+
+
+class OpenCVDecoder:
+    ''' cv2.VideoCapture with default settings, positioned by a FrameCursor. Full resolution BGR frames. '''
+    name = "opencv"
+
+    def __init__(self, path, index=None):
+        self.cap = cv2.VideoCapture(path)
+        self.opened = self.cap.isOpened()
+        if index is not None:
+            self.length, self.fps = index.count, index.fps
+        else:
+            self.length = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.cursor = FrameCursor(self.cap, index=index)
+        self.bgr = True
+
+    def read(self, idx):
+        ''' (ret, frame) for frame idx. '''
+        return self.cursor.read(idx)
+
+    def stats(self):
+        return self.cursor.stats()
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVDecoder:
+    ''' FFmpeg through PyAV. The decoder's thread count and threading type (frame and/or slice)
+        are configurable, and frames are converted by libswscale straight into the requested
+        pixel format and size (e.g. format="rgb24", scale=0.5) instead of full size BGR.
+        Seeks are exact: to the keyframe before the target, then decoding forward until the
+        presentation timestamp of the target frame, with the VideoIndex when there is one.
+    '''
+    name = "pyav"
+
+    def __init__(self, path, index=None, threads=DECODE_THREADS, threadType=THREAD_TYPE, format="bgr24", scale=1.0):
+        if av is None:
+            raise ImportError("The pyav decoder needs PyAV (pip install av)")
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = threadType
+        self.stream.thread_count = threads
+        self.opened = True
+        self.index = index
+        self.format = format
+        self.width, self.height, self.interpolation = None, None, None
+        if scale != 1.0:
+            self.interpolation = "AREA"     # faster than the default bicubic, and meant for shrinking
+            codec = self.stream.codec_context
+            self.width, self.height = max(2, int(codec.width * scale) // 2 * 2), max(2, int(codec.height * scale) // 2 * 2)
+        self.bgr = format == "bgr24"
+        self.timeBase = float(self.stream.time_base)
+        self.start = self.stream.start_time or 0
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        if index is not None:
+            self.length, self.fps = index.count, index.fps
+        else:
+            self.fps = float(rate) if rate else 0.0
+            self.length = self.stream.frames or int((self.stream.duration or 0) * self.timeBase * self.fps)
+        self.frames = None      # decode generator, None after a failure or before the first seek
+        self.position = -1      # index of the frame the generator yields next
+        self.seekCost, self.frameCost = None, None
+        self.seeks, self.skips, self.reads = 0, 0, 0
+
+    def frameIndex(self, frame):
+        seconds = (frame.pts - self.start) * self.timeBase
+        if self.index is not None:
+            return self.index.frameAt(seconds)
+        return int(round(seconds * self.fps))
+
+    def seconds(self, idx):
+        if self.index is not None:
+            return self.index.time(idx)
+        return idx / self.fps if self.fps else 0.0
+
+    def shouldDecode(self, idx):
+        ''' Decode forward from the current position rather than seek. '''
+        gap = idx - self.position
+        if self.frames is None or gap < 0:
+            return False
+        if self.index is not None and self.position >= self.index.keyframeBefore(idx):
+            return True     # a seek would decode from that keyframe anyway
+        if self.seekCost is None or self.frameCost is None:
+            return gap <= GUESS_FORWARD
+        return gap * self.frameCost < self.seekCost
+
+    @timed("pyav.seek")
+    def seek(self, idx):
+        ''' Position the decoder at the keyframe before idx, earlier keyframes if the demuxer overshoots. '''
+        starts = [idx]
+        if self.index is not None:
+            kf = self.index.keyframeBefore(idx)
+            starts += [self.index.keyframeBefore(kf - 1)]
+        for start in starts + [0]:
+            t0 = time.perf_counter()
+            pts = self.start + int(self.seconds(start) / self.timeBase)
+            self.container.seek(pts, stream=self.stream, backward=True, any_frame=False)
+            self.frames = self.container.decode(self.stream)
+            frame = next(self.frames, None)
+            self.seeks += 1
+            if frame is None:
+                break
+            landed = self.frameIndex(frame)
+            self.seekCost = average(self.seekCost, time.perf_counter() - t0)
+            if landed <= idx or start == 0:
+                self.position = landed + 1
+                return frame
+        self.frames, self.position = None, -1
+        return None
+
+    @timed("pyav.read")
+    def read(self, idx):
+        ''' (ret, frame) for frame idx, in self.format. '''
+        frame = None
+        if not self.shouldDecode(idx):
+            frame = self.seek(idx)
+            if frame is None:
+                return False, None
+        t0, n = time.perf_counter(), 0
+        while self.position <= idx:
+            frame = next(self.frames, None)
+            if frame is None:
+                self.frames, self.position = None, -1
+                return False, None
+            self.position = self.frameIndex(frame) + 1
+            n += 1
+        if n:
+            self.frameCost = average(self.frameCost, (time.perf_counter() - t0) / n)
+            self.skips += n - 1
+        # frame is the first at or after idx, which is idx unless the stream skips frames
+        self.reads += 1
+        with stage("pyav.convert"):
+            return True, frame.to_ndarray(format=self.format, width=self.width, height=self.height, interpolation=self.interpolation)
+
+    def stats(self):
+        return {"seeks": self.seeks, "grabs": self.skips, "reads": self.reads}
+
+    def release(self):
+        self.container.close()
+
+
+BACKENDS = {"opencv": OpenCVDecoder, "pyav": PyAVDecoder}
+
+
+def openDecoder(path, backend=None, index=None, **options):
+    ''' Decoder of path with the given backend (VFS_DECODER by default). Falls back to OpenCV
+        when PyAV is not installed or cannot open the file.
+    '''
+    backend = backend or DECODER
+    if backend == "pyav":
+        if av is None:
+            print("PyAV is not installed, decoding with OpenCV")
+        else:
+            try:
+                return PyAVDecoder(path, index=index, **options)
+            except (OSError, ValueError) as e:
+                print(f"PyAV could not open {path} ({e}), decoding with OpenCV")
+        backend = "opencv"
+    return BACKENDS[backend](path, index=index)
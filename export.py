@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+''' Export a dataset folder to sharded training formats instead of loose images.
+
+    python export.py dataset/ --out shards/                                 # WebDataset style tar shards of the images as they are
+    python export.py dataset/ --out shards/ --size 320x180                  # re-encoded at 320x180
+    python export.py dataset/ --out arrays/ --format npy --size 224x224     # NumPy RGB arrays and a label matrix per shard
+    python export.py dataset/ --out shards/ --from-video                    # decoded from the source videos, no images needed
+
+    A tar shard holds {name}.jpg and {name}.json (the labels) for each frame. An npy shard is
+    shard-NNNNNN.images.npy (N x H x W x 3 uint8, memmappable) and shard-NNNNNN.labels.npy
+    (N x labels int32, columns listed in export.json).
+    Exports are incremental: export.json in the output folder lists the frames of every finished
+    shard and a rerun only exports frames added since. A shard only counts once it is complete,
+    so an interrupted export resumes at the first unfinished shard. Labels changed or frames
+    removed after they were exported need --full.
+'''
+
+import argparse, io, json, os, sys, tarfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2
+from dataset import Dataset, labelNames, loadSources, atomicWrite
+from decoders import openDecoder
+from folderindex import FolderIndex, parseName, ordered
+from videoindex import loadIndex
+
+SHARD_SIZE = 1000   # frames per shard
+WORKERS = 8         # encoding threads, imread/resize/imencode release the GIL
+MANIFEST = "export.json"
+
+
+def parseSize(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def samples(folder, dataset, fromVideo):
+    ''' The frames of the dataset with where to read them from, grouped by video in frame order. '''
+    images = {e["name"]: e["path"] for e in FolderIndex(folder).scan()}
+    sources = loadSources(folder) if fromVideo else {}
+    entries = []
+    for name, labels in dataset.frames.items():
+        video, frame = parseName(name)
+        source = sources.get(video) if frame is not None else None
+        if source is not None and not os.path.exists(source):
+            source = None
+        if source is None and name not in images:
+            print(f"Warning: no image or source video for {name}, skipped")
+            continue
+        entries.append({"name": name, "video": video, "frame": frame, "path": images.get(name), "source": source, "labels": labels})
+    return ordered(entries)
+
+
+def frames(entries):
+    ''' (entry, BGR frame or None) for entries with a source video, decoding each video once in frame order.
+        Entries without one are passed through with None, their image is read by the worker.
+    '''
+    decoder, current = None, None
+    for e in entries:
+        if e["source"] is None:
+            yield e, None
+            continue
+        if e["source"] != current:
+            if decoder is not None:
+                decoder.release()
+            current = e["source"]
+            decoder = openDecoder(current, index=loadIndex(current))
+        ret, frame = decoder.read(e["frame"])
+        yield e, frame if ret else None
+    if decoder is not None:
+        decoder.release()
+
+
+class Exporter:
+    ''' Writes the entries not exported yet to new shards of args.format, with a pool of workers
+        reading/decoding, resizing and encoding the frames while shards are written in order.
+    '''
+    def __init__(self, args, labels):
+        self.args = args
+        self.labels = labels
+        self.size = parseSize(args.size) if args.size else None
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, args.quality]
+        self.pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="export")
+        self.slots = threading.BoundedSemaphore(args.workers * 4)     # frames decoded but not encoded yet
+
+    def image(self, entry, frame):
+        ''' BGR frame of entry at the export size, reading its image if it was not decoded from the video. '''
+        if frame is None:
+            if entry["path"] is None:
+                raise IOError(f"Could not decode frame {entry['frame']} of {entry['source']}")
+            frame = cv2.imread(entry["path"], cv2.IMREAD_COLOR)
+            if frame is None:
+                raise IOError(f"Could not read {entry['path']}")
+        if self.size is not None and (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        return frame
+
+    def encode(self, entry, frame):
+        ''' (file extension, bytes) of the image stored in a tar shard. '''
+        if frame is None and self.size is None:
+            # the image file as it is, no decode or re-encode
+            with open(entry["path"], "rb") as f:
+                return os.path.splitext(entry["path"])[1][1:].lower(), f.read()
+        ok, buf = cv2.imencode(".jpg", self.image(entry, frame), self.params)
+        if not ok:
+            raise IOError(f"Could not encode {entry['name']}")
+        return "jpg", buf.tobytes()
+
+    def submit(self, fn, *args):
+        self.slots.acquire()
+        future = self.pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self.slots.release())
+        return future
+
+    def writeTar(self, path, chunk):
+        futures = [(e, self.submit(self.encode, e, frame)) for e, frame in frames(chunk)]
+        names = []
+        with tarfile.open(path, "w") as tar:
+            for e, future in futures:
+                try:
+                    ext, data = future.result()
+                except Exception as err:
+                    print(f"Error exporting {e['name']}: {err}")
+                    continue
+                for member, payload in ((f"{e['name']}.{ext}", data), (f"{e['name']}.json", json.dumps(e["labels"]).encode())):
+                    info = tarfile.TarInfo(member)
+                    info.size, info.mtime = len(payload), int(time.time())
+                    tar.addfile(info, io.BytesIO(payload))
+                names.append(e["name"])
+        return names
+
+    def writeNpy(self, path, chunk):
+        w, h = self.size
+        images = np.lib.format.open_memmap(f"{path}.images", mode="w+", dtype=np.uint8, shape=(len(chunk), h, w, 3))
+        labels = np.zeros((len(chunk), len(self.labels)), np.int32)
+        column = {l: i for i, l in enumerate(self.labels)}
+
+        def store(row, e, frame):
+            images[row] = cv2.cvtColor(self.image(e, frame), cv2.COLOR_BGR2RGB)
+        futures = [(e, self.submit(store, row, e, frame)) for row, (e, frame) in enumerate(frames(chunk))]
+        ok = []
+        for row, (e, future) in enumerate(futures):
+            try:
+                future.result()
+            except Exception as err:
+                print(f"Error exporting {e['name']}: {err}")
+                continue
+            for l, v in e["labels"].items():
+                if l in column:
+                    labels[row, column[l]] = v
+            ok.append(row)
+        if len(ok) < len(chunk):
+            np.save(f"{path}.rows", np.asarray(images[ok]))
+            del images
+            os.replace(f"{path}.rows.npy", f"{path}.images")
+        else:
+            images.flush()
+            del images
+        np.save(f"{path}.labels", labels[ok])
+        return [chunk[row]["name"] for row in ok]
+
+    def write(self, path, chunk):
+        ''' Write a shard through temporary files and rename them once it is complete. Returns
+            (files, names of the frames written).
+        '''
+        if self.args.format == "tar":
+            names = self.writeTar(f"{path}.part", chunk)
+            os.replace(f"{path}.part", f"{path}.tar")
+            return [f"{path}.tar"], names
+        names = self.writeNpy(f"{path}.part", chunk)
+        os.replace(f"{path}.part.images", f"{path}.images.npy")
+        os.replace(f"{path}.part.labels.npy", f"{path}.labels.npy")
+        return [f"{path}.images.npy", f"{path}.labels.npy"], names
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+def loadManifest(args, labels):
+    path = os.path.join(args.out, MANIFEST)
+    settings = {"format": args.format, "size": args.size, "quality": args.quality}
+    manifest = {**settings, "labels": labels, "shards": []}
+    if os.path.exists(path) and not args.full:
+        with open(path) as f:
+            manifest = json.load(f)
+        changed = [k for k, v in settings.items() if manifest.get(k) != v]
+        if changed:
+            raise SystemExit(f"{args.out} was exported with different {', '.join(changed)}; use --full or another --out")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", help="dataset folder (data.json and frames)")
+    parser.add_argument("--out", required=True, help="output folder of the shards")
+    parser.add_argument("--format", default="tar", choices=["tar", "npy"])
+    parser.add_argument("--size", help="WxH the frames are resized to, required for npy")
+    parser.add_argument("--quality", type=int, default=95, help="jpg quality of re-encoded frames")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="frames per shard")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="encoding threads")
+    parser.add_argument("--from-video", action="store_true", help="decode frames from their source videos (videos.json) instead of reading the images")
+    parser.add_argument("--full", action="store_true", help="export everything again instead of only the new frames")
+    args = parser.parse_args(argv)
+    if args.format == "npy" and not args.size:
+        parser.error("--format npy needs --size")
+
+    os.makedirs(args.out, exist_ok=True)
+    dataset = Dataset.load(args.folder, labelNames(args.folder))
+    labels = list(dataset._keys)
+    manifest = loadManifest(args, labels)
+    if args.format == "npy" and manifest["labels"] != labels:
+        # new labels get new columns, the columns of every shard are recorded with it
+        manifest["labels"] = manifest["labels"] + [l for l in labels if l not in manifest["labels"]]
+    done = {name for shard in manifest["shards"] for name in shard["names"]}
+    pending = [e for e in samples(args.folder, dataset, args.from_video) if e["name"] not in done]
+    print(f"{len(done)} frames already exported, {len(pending)} to export")
+
+    exporter = Exporter(args, manifest["labels"])
+    t0, written = time.perf_counter(), 0
+    try:
+        for start in range(0, len(pending), args.shard_size):
+            chunk = pending[start:start + args.shard_size]
+            path = os.path.join(args.out, f"shard-{len(manifest['shards']):06d}")
+            files, names = exporter.write(path, chunk)
+            shard = {"files": [os.path.basename(f) for f in files], "names": names}
+            if args.format == "npy":
+                shard["labels"] = manifest["labels"]
+            manifest["shards"].append(shard)
+            # the shard is only part of the export once the manifest says so
+            atomicWrite(os.path.join(args.out, MANIFEST), json.dumps(manifest))
+            written += len(names)
+            print(f"{shard['files'][0]}: {len(names)} frames")
+    finally:
+        exporter.close()
+    elapsed = time.perf_counter() - t0
+    print(f"{written} frames exported in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
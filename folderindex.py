@@ -0,0 +1,104 @@
+import os
+from operator import itemgetter
+
+VALID_FORMAT = ('.BMP', '.GIF', '.JPG', '.JPEG', '.PNG', '.PBM', '.PGM', '.PPM', '.TIFF', '.XBM', '.WEBP')  # Image formats supported by Qt
+LAST = 1 << 62      # sort position of names without a frame index
+
+
+def parseName(name):
+    ''' (video, frame index) of a frame name written as {video}_{idx}; (name, None) for anything else. '''
+    video, _, idx = name.rpartition("_")
+    if video and idx.isdigit():
+        return video, int(idx)
+    return name, None
+
+
+def ordered(entries):
+    ''' Frames grouped by video in frame order, names without a frame index after the frames.
+        Two stable sorts on plain keys, much cheaper than one sort on tuples at 100k files.
+    '''
+    entries = list(entries)
+    entries.sort(key=lambda e: LAST if e["frame"] is None else e["frame"])
+    entries.sort(key=itemgetter("video"))
+    return entries
+
+
+class FolderIndex:
+    ''' The images of a dataset folder, scanned once with os.scandir and then kept up to date
+        incrementally: add()/written()/remove() for changes the program makes itself, refresh()
+        to pick up outside changes by diffing the listing against the cached one. The program
+        settles the index after each of its own changes, taking the folder's new mtime as known,
+        so refresh() only lists the folder again for changes made by others.
+    '''
+    def __init__(self, folder):
+        self.folder = folder
+        self.files = {}         # file name -> entry {'name', 'path', 'video', 'frame'}
+        self.pending = set()    # file names added by the program and still being written
+        self.mtime = None
+
+    def _entry(self, dirent):
+        name = dirent.name.partition(".")[0]
+        video, frame = parseName(name)
+        return {"name": name, "path": dirent.path, "video": video, "frame": frame}
+
+    def _listing(self):
+        with os.scandir(self.folder) as it:
+            return {d.name: d for d in it if d.name.upper().endswith(VALID_FORMAT) and d.is_file()}
+
+    def scan(self):
+        ''' Full scan, returns the sorted entries. '''
+        self.files = {}
+        if os.path.isdir(self.folder):
+            self.mtime = os.stat(self.folder).st_mtime_ns
+            self.files = {f: self._entry(d) for f, d in self._listing().items()}
+        return self.entries()
+
+    def entries(self):
+        return ordered(self.files.values())
+
+    def refresh(self):
+        ''' Pick up changes made by others. Returns (added entries, removed entries). '''
+        if not os.path.isdir(self.folder):
+            return [], list(self.files.values())
+        mtime = os.stat(self.folder).st_mtime_ns
+        if mtime == self.mtime:
+            return [], []
+        self.mtime = mtime
+        listing = self._listing()
+        added = [self._entry(listing[f]) for f in listing.keys() - self.files.keys()]
+        # a frame still being written is not there yet, but it has not been removed either
+        removed = [self.files.pop(f) for f in self.files.keys() - listing.keys() - self.pending]
+        for e in added:
+            self.files[os.path.basename(e["path"])] = e
+        return ordered(added), removed
+
+    def settle(self):
+        ''' Take the folder as it is now as known, after the program changed it itself (wrote a
+            frame or data.json, removed a frame). A change made by someone else at that very
+            moment is only picked up with the next one.
+        '''
+        if os.path.isdir(self.folder):
+            self.mtime = os.stat(self.folder).st_mtime_ns
+
+    def add(self, path):
+        ''' Record a file the program is writing, without rescanning. It stays listed while pending, see written(). '''
+        fname = os.path.basename(path)
+        name = fname.partition(".")[0]
+        video, frame = parseName(name)
+        self.files[fname] = {"name": name, "path": path, "video": video, "frame": frame}
+        self.pending.add(fname)
+        return self.files[fname]
+
+    def written(self, path, ok=True):
+        ''' The write of a file given to add() landed (or failed, then it is dropped). '''
+        fname = os.path.basename(path)
+        self.pending.discard(fname)
+        if not ok:
+            self.files.pop(fname, None)
+        self.settle()
+
+    def remove(self, path):
+        ''' Record a file the program removed itself. '''
+        entry = self.files.pop(os.path.basename(path), None)
+        self.settle()
+        return entry
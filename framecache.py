@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = 1024 * 1024**2  # default budget; a decoded 4K RGB frame is ~24 MB
+
+
+class FrameCache:
+    ''' LRU cache of decoded frames keyed by (video path, frame index).
+        Entries are evicted by total size in bytes, not by count, so the budget means
+        the same thing for 480p and 4K footage.
+    '''
+    def __init__(self, maxBytes=MAX_BYTES):
+        self.maxBytes = maxBytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        with self.lock:
+            frame = self.entries.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        if frame is None or frame.nbytes > self.maxBytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self.entries[key] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.maxBytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "frames": len(self.entries), "bytes": self.nbytes}
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from PyQt5 import QtCore
+from PyQt5.QtGui import QColor
+
+STATE_COLORS = {"pending": QColor(QtCore.Qt.gray), "deleted": QColor(QtCore.Qt.red), "failed": QColor(QtCore.Qt.red)}
+
+
+class ImageListModel(QtCore.QAbstractListModel):
+    ''' The sampled images of a folder for qlist_images. Only the rows on screen are ever
+        asked for, so nothing is created per image. Entries are {'name', 'path', 'state'} dicts;
+        what is shown is the subset (label selection) intersected with the text filter, kept
+        as a sorted list of positions into self.entries.
+    '''
+    def __init__(self, thumbs=None, parent=None):
+        super(ImageListModel, self).__init__(parent)
+        self.thumbs = thumbs
+        self.entries = []
+        self.names = {}         # name -> position in entries
+        self.paths = {}         # path -> position in entries
+        self.lower = []         # precomputed lower case names for filtering
+        self.subset = None      # set of names of the label selection, None for all
+        self.text = ""
+        self.rows = []          # positions in entries of the visible rows, ascending
+
+    # Qt interface
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        entry = self.entries[self.rows[index.row()]]
+        if role == QtCore.Qt.DisplayRole:
+            return entry["name"]
+        if role == QtCore.Qt.UserRole:
+            return entry["path"]
+        if role == QtCore.Qt.ForegroundRole:
+            return STATE_COLORS.get(entry.get("state"))
+        if role == QtCore.Qt.DecorationRole and self.thumbs is not None:
+            # asked only for painted rows, which makes thumbnail loading lazy
+            image = self.thumbs.get(entry["path"])
+            if image is None:
+                self.thumbs.request(entry["path"])
+            return image
+        return None
+
+    # content
+    def setEntries(self, entries):
+        self.beginResetModel()
+        self.entries = entries
+        for e in entries:
+            e.setdefault("state", None)
+        self.names = {e["name"]: i for i, e in enumerate(self.entries)}
+        self.paths = {e["path"]: i for i, e in enumerate(self.entries)}
+        self.lower = [e["name"].lower() for e in self.entries]
+        self.rows = self._select(range(len(self.entries)))
+        self.endResetModel()
+
+    def append(self, entry):
+        pos = len(self.entries)
+        entry.setdefault("state", None)
+        self.entries.append(entry)
+        self.names[entry["name"]] = pos
+        self.paths[entry["path"]] = pos
+        self.lower.append(entry["name"].lower())
+        if self._select([pos]):
+            self.beginInsertRows(QtCore.QModelIndex(), len(self.rows), len(self.rows))
+            self.rows.append(pos)
+            self.endInsertRows()
+
+    def setSubset(self, names):
+        ''' Show only the entries whose name is in names (None shows all). '''
+        self.beginResetModel()
+        self.subset = names
+        self.rows = self._select(range(len(self.entries)))
+        self.endResetModel()
+
+    def setFilter(self, text):
+        ''' Filter names by substring. When the new text contains the previous one only the
+            rows currently shown can still match, so just those are checked.
+        '''
+        text = text.strip().lower()
+        candidates = self.rows if self.text and self.text in text else range(len(self.entries))
+        self.text = text
+        self.beginResetModel()
+        self.rows = self._select(candidates)
+        self.endResetModel()
+
+    def _select(self, positions):
+        subset, text, entries, lower = self.subset, self.text, self.entries, self.lower
+        if subset is not None:
+            positions = [i for i in positions if entries[i]["name"] in subset]
+        if text:
+            positions = [i for i in positions if text in lower[i]]
+        return list(positions)
+
+    # lookups
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def entry(self, row):
+        return self.entries[self.rows[row]] if 0 <= row < len(self.rows) else None
+
+    def rowOf(self, name):
+        ''' Visible row of name, or -1. '''
+        pos = self.names.get(name)
+        if pos is None:
+            return -1
+        row = bisect_left(self.rows, pos)
+        return row if row < len(self.rows) and self.rows[row] == pos else -1
+
+    def setState(self, name, state):
+        ''' state is None, "pending", "deleted" or "failed"; it decides the text colour. '''
+        pos = self.names.get(name)
+        if pos is None:
+            return
+        self.entries[pos]["state"] = state
+        self._changed(self.rowOf(name))
+
+    def thumbnailReady(self, path):
+        pos = self.paths.get(path)
+        if pos is not None:
+            self._changed(self.rowOf(self.entries[pos]["name"]))
+
+    def _changed(self, row):
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
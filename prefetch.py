@@ -0,0 +1,115 @@
+import threading
+from timing import timed
+
+AHEAD = 8                   # frames decoded ahead of the current one, in steps of the jump
+BEHIND = 2                  # frames kept behind the current one, in steps of the jump
+MAX_BYTES = 512 * 1024**2   # memory cap of the ring buffer
+
+
+class Prefetcher(threading.Thread):
+    ''' Background thread that owns a decoder (see decoders.py) and keeps the frames around the
+        current position (target + k*jump for -BEHIND <= k <= AHEAD) decoded. Frames are kept
+        as the decoder returns them (BGR by default), conversion is left to whoever needs it.
+        The GUI thread only calls get(), which returns a ready frame or waits for it.
+    '''
+    def __init__(self, decoder, length, ahead=AHEAD, behind=BEHIND, maxBytes=MAX_BYTES):
+        super(Prefetcher, self).__init__(daemon=True)
+        self.decoder = decoder
+        self.length = length
+        self.ahead, self.behind, self.maxBytes = ahead, behind, maxBytes
+
+        self.cond = threading.Condition()
+        self.frames = {}            # frame index -> BGR ndarray, the ring buffer
+        self.nbytes = 0
+        self.failed = set()         # indices the decoder failed on since the last retarget
+        self.target, self.jump = 0, 1
+        self.running = True
+        self.parked = False         # idle in a session pool: nothing is decoded or kept
+        self.hits, self.misses = 0, 0
+
+    def wanted(self):
+        ''' Frame indices to keep, in the order they should be decoded. '''
+        if self.parked:
+            return []
+        order = [self.target + k * self.jump for k in range(self.ahead + 1)]
+        order += [self.target - k * self.jump for k in range(1, self.behind + 1)]
+        return [i for i in order if 0 <= i < self.length]
+
+    def retarget(self, idx, jump=None):
+        ''' Move the window to idx (and optionally change the step), dropping frames outside it.
+            A negative jump means the user is stepping backwards, so prefetch in that direction.
+        '''
+        with self.cond:
+            self.target = idx
+            self.parked = False
+            # failures can be transient (a bad packet, a failed seek), so they are tried again
+            self.failed.clear()
+            if jump:
+                self.jump = jump
+            keep = set(self.wanted())
+            for i in [i for i in self.frames if i not in keep]:
+                self.nbytes -= self.frames.pop(i).nbytes
+            self.cond.notify_all()
+
+    @timed("prefetch.get")
+    def get(self, idx, jump=None, timeout=5.0):
+        ''' Return the BGR frame idx, or None if it could not be decoded. '''
+        with self.cond:
+            if idx in self.frames:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.retarget(idx, jump)
+        with self.cond:
+            self.cond.wait_for(lambda: idx in self.frames or idx in self.failed or idx >= self.length or idx != self.target or not self.running, timeout)
+            return self.frames.get(idx)
+
+    def park(self):
+        ''' Drop the buffered frames and stop decoding ahead, keeping the decoder open and where it is
+            so the next get() picks up from the warm decoder.
+        '''
+        with self.cond:
+            self.parked = True
+            self.frames.clear()
+            self.nbytes = 0
+            self.cond.notify_all()
+
+    def cancel(self):
+        ''' Stop the worker and release the decoder. '''
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        self.decoder.release()
+
+    def stats(self):
+        with self.cond:
+            return {"hits": self.hits, "misses": self.misses, "frames": len(self.frames), "bytes": self.nbytes}
+
+    def _next(self):
+        ''' Next index to decode; the current target is always decoded, the rest only within the memory cap. '''
+        for i in self.wanted():
+            if i not in self.frames and i not in self.failed:
+                if i == self.target or self.nbytes < self.maxBytes:
+                    return i
+                return None
+        return None
+
+    def run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: not self.running or self._next() is not None)
+                if not self.running:
+                    return
+                idx = self._next()
+            ret, frame = self.decoder.read(idx)
+            with self.cond:
+                if idx in self.wanted():
+                    if not ret:
+                        # remember the failure so get() does not wait for it and it is not decoded again in a loop
+                        self.failed.add(idx)
+                    else:
+                        self.frames[idx] = frame
+                        self.nbytes += frame.nbytes
+                self.cond.notify_all()
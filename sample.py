@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+''' Headless frame sampling: extract frames from videos into a dataset folder without the GUI.
+    Frames are named and recorded in data.json exactly as saveFrame does.
+
+    python sample.py --out dataset/ --every 30 a.mp4 b.mp4
+    python sample.py --out dataset/ --per-second 2 a.mp4
+    python sample.py --out dataset/ --frames 10,250,900 a.mp4
+    python sample.py --out dataset/ --times 1.5,12,60.25 a.mp4
+    python sample.py --out dataset/ --every 10 --processes 8 long.mp4
+'''
+
+import argparse, os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from dataset import Dataset, videoName, frameName, labelNames, loadSources, saveSources
+from writer import FrameWriter
+from videoindex import loadIndex
+
+MIN_SEGMENT = 500     # frames; shorter videos are not split across processes
+
+
+def parseList(text, cast):
+    return sorted({cast(v) for v in text.split(",") if v.strip()})
+
+
+def selector(args, fps):
+    ''' Returns (wanted(idx) -> bool, last index needed or None if open ended). '''
+    if args.every:
+        return (lambda i: i % args.every == 0), None
+    if args.per_second:
+        step = fps / args.per_second
+        # frame nearest to each k*step, so the rate is right even for fractional steps
+        return (lambda i: int(round(int(round(i / step)) * step)) == i), None
+    if args.frames:
+        wanted = set(parseList(args.frames, int))
+    else:
+        wanted = {int(round(t * fps)) for t in parseList(args.times, float)}
+    return wanted.__contains__, max(wanted)
+
+
+def keyframes(path):
+    ''' Frame indices of the keyframes of path, from its VideoIndex, or [] if they are unknown. '''
+    index = loadIndex(path)
+    return [] if index is None else index.keyframes.tolist()
+
+
+def segments(path, parts):
+    ''' Split path into at most parts (start, end) frame ranges starting on keyframes; the last end is None (open). '''
+    cap = cv2.VideoCapture(path)
+    length = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    parts = max(1, min(parts, length // MIN_SEGMENT))
+    if parts == 1:
+        return [(0, None)]
+    starts = [length * k // parts for k in range(parts)]
+    keys = keyframes(path)
+    if keys:
+        # move every boundary back to the keyframe before it, so no worker decodes a GOP twice
+        starts = [max([k for k in keys if k <= s] or [0]) for s in starts]
+    starts = sorted(set(starts))
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def sampleRange(task):
+    ''' Decode frames [start, end) of a video sequentially, grab() past unwanted frames and write the
+        wanted ones. Runs in a worker process with its own capture. Returns (path, decoded, names of
+        the frames written), frames whose write failed are left out.
+    '''
+    path, start, end, args = task
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        print(f"Error opening video stream or file {path}")
+        return path, 0, []
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    wanted, last = selector(args, fps)
+    if last is not None:
+        end = last + 1 if end is None else min(end, last + 1)
+    video = videoName(path)
+    written = set()     # paths the writer reported landed, filled from its threads
+    writer = FrameWriter(args.format, args.quality, workers=args.workers, done=lambda p, ok: ok and written.add(p))
+    if start:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    idx, submitted = start, []
+    while end is None or idx < end:
+        if not cap.grab():
+            break
+        if wanted(idx):
+            ret, frame = cap.retrieve()
+            if ret:
+                name = frameName(video, idx)
+                submitted.append((name, f"{args.out}/{name}.{writer.ext}"))
+                writer.submit(submitted[-1][1], frame)
+        idx += 1
+    cap.release()
+    writer.close()
+    return path, idx - start, [name for name, p in submitted if p in written]
+
+
+def plan(args):
+    ''' One task per video, or per keyframe-aligned segment when there are fewer videos than processes. '''
+    parts = -(-args.processes // len(args.videos))
+    return [(path, start, end, args) for path in args.videos
+            for start, end in (segments(path, parts) if parts > 1 else [(0, None)])]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--out", required=True, help="dataset folder (data.json and frames)")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--every", type=int, help="every N-th frame")
+    mode.add_argument("--per-second", type=float, help="N frames per second of video")
+    mode.add_argument("--frames", help="comma separated frame indices")
+    mode.add_argument("--times", help="comma separated timestamps in seconds")
+    parser.add_argument("--format", default="jpg", choices=["jpg", "png", "webp"])
+    parser.add_argument("--quality", type=int, default=95)
+    parser.add_argument("--workers", type=int, default=4, help="encoder threads per process")
+    parser.add_argument("--processes", type=int, default=1, help="decoding processes, across videos and segments of a video")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out, exist_ok=True)
+    dataset = Dataset.load(args.out, labelNames(args.out))
+    t0 = time.perf_counter()
+    decoded, saved, perVideo, seen = 0, 0, {}, set()
+    tasks = plan(args)
+    if args.processes > 1:
+        # one OpenCV thread per worker, the pool is what provides the parallelism
+        with ProcessPoolExecutor(max_workers=args.processes, initializer=cv2.setNumThreads, initargs=(1,)) as pool:
+            results = list(pool.map(sampleRange, tasks))
+    else:
+        results = map(sampleRange, tasks)
+    for path, d, names in results:
+        for name in names:
+            if name in seen:
+                print(f"Warning: {name} sampled by two segments")
+            seen.add(name)
+            dataset.add_frame(name, dataset.frames.get(name, {}))
+        stats = perVideo.setdefault(path, [0, 0])
+        stats[0], stats[1] = stats[0] + d, stats[1] + len(names)
+        decoded, saved = decoded + d, saved + len(names)
+    for path, (d, s) in perVideo.items():
+        print(f"{path}: {s} frames sampled out of {d} decoded")
+    dataset.save(args.out)
+    # lets the GUI reopen a video at a sampled frame
+    sources = loadSources(args.out)
+    sources.update({videoName(path): os.path.realpath(path) for path in perVideo})
+    saveSources(args.out, sources)
+    elapsed = time.perf_counter() - t0
+    print(f"{saved} frames written, {decoded} decoded in {elapsed:.1f}s ({decoded / max(elapsed, 1e-9):.1f} decoded fps, {saved / max(elapsed, 1e-9):.1f} saved fps)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
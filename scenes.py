@@ -0,0 +1,118 @@
+import threading
+import numpy as np
+import cv2
+from sidecar import sidecarPath, readSidecar, writeSidecar
+
+BINS = 32               # grayscale histogram bins per frame
+THUMB = (64, 36)        # frames are shrunk to this before computing signatures
+BATCH = 256             # frames per vectorised signature batch
+CUT_THRESHOLD = 0.35    # L1 histogram distance between consecutive frames counted as a scene cut
+DRIFT_THRESHOLD = 20    # differing dHash bits (of 64) since the last proposal counted as new content
+MIN_GAP = 5             # minimum frames between two proposals
+
+
+def signatures(thumbs):
+    ''' Histograms (N x BINS, normalised) and 64 bit difference hashes (N x 8 bytes) of a
+        batch of N grayscale thumbnails, computed with whole-batch array operations.
+    '''
+    n = len(thumbs)
+    bins = (thumbs.reshape(n, -1).astype(np.int32) * BINS) >> 8
+    bins += (np.arange(n, dtype=np.int32) * BINS)[:, None]
+    hist = np.bincount(bins.ravel(), minlength=n * BINS).reshape(n, BINS).astype(np.float32)
+    hist /= thumbs[0].size
+    # dHash: sign of horizontal gradients on a 9x8 grid
+    small = np.stack([cv2.resize(t, (9, 8), interpolation=cv2.INTER_AREA) for t in thumbs])
+    hashes = np.packbits((small[:, :, 1:] > small[:, :, :-1]).reshape(n, 64), axis=1)
+    return hist, hashes
+
+
+def computeSignatures(path, progress=None, cancelled=None):
+    ''' One sequential pass over the video; returns (hist, hashes) for every frame. '''
+    cap = cv2.VideoCapture(path)
+    hists, hashes, batch = [], [], []
+    while cancelled is None or not cancelled():
+        ret, frame = cap.read()
+        if ret:
+            gray = cv2.cvtColor(cv2.resize(frame, THUMB, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            batch.append(gray)
+        if batch and (len(batch) == BATCH or not ret):
+            h, d = signatures(np.stack(batch))
+            hists.append(h)
+            hashes.append(d)
+            batch = []
+            if progress is not None:
+                progress(sum(len(h) for h in hists))
+        if not ret:
+            break
+    cap.release()
+    if not hists:
+        return np.zeros((0, BINS), np.float32), np.zeros((0, 8), np.uint8)
+    return np.concatenate(hists), np.concatenate(hashes)
+
+
+def loadSignatures(path, **kwargs):
+    ''' Signatures of the video at path, computed once and then read back from a sidecar file. '''
+    sidecar = sidecarPath(path, "signatures")
+    saved = readSidecar(sidecar, "hist", "hashes")
+    if saved is not None:
+        return saved
+    hist, hashes = computeSignatures(path, **kwargs)
+    if kwargs.get("cancelled") is None or not kwargs["cancelled"]():
+        writeSidecar(sidecar, compressed=True, hist=hist, hashes=hashes)
+    return hist, hashes
+
+
+def proposals(hist, hashes, cut=CUT_THRESHOLD, drift=DRIFT_THRESHOLD, minGap=MIN_GAP):
+    ''' Frame indices worth annotating: the first frame, every scene cut and every frame whose
+        content drifted more than drift hash bits away from the previous proposal.
+    '''
+    n = len(hist)
+    if n == 0:
+        return np.zeros(0, np.int64)
+    cuts = np.zeros(n, bool)
+    cuts[1:] = np.abs(np.diff(hist, axis=0)).sum(axis=1) > cut
+    bits = np.unpackbits(hashes, axis=1).astype(bool)
+    picked, last = [0], 0
+    for i in range(1, n):
+        if i - last < minGap:
+            continue
+        if cuts[i] or np.count_nonzero(bits[i] != bits[last]) > drift:
+            picked.append(i)
+            last = i
+    return np.array(picked, np.int64)
+
+
+class SceneIndex(threading.Thread):
+    ''' Computes (or loads) the signatures of a video in the background and then exposes the
+        proposed frames; next()/prev() return the proposal after/before a frame, or None
+        while the pass is still running.
+    '''
+    def __init__(self, path):
+        super(SceneIndex, self).__init__(daemon=True)
+        self.path = path
+        self.frames = None
+        self.done = 0
+        self.stopped = False
+
+    def run(self):
+        hist, hashes = loadSignatures(self.path, progress=self.onProgress, cancelled=lambda: self.stopped)
+        if not self.stopped:
+            self.frames = proposals(hist, hashes)
+
+    def onProgress(self, done):
+        self.done = done
+
+    def cancel(self):
+        self.stopped = True
+
+    def next(self, idx):
+        if self.frames is None:
+            return None
+        i = np.searchsorted(self.frames, idx, side="right")
+        return int(self.frames[i]) if i < len(self.frames) else None
+
+    def prev(self, idx):
+        if self.frames is None:
+            return None
+        i = np.searchsorted(self.frames, idx, side="left")
+        return int(self.frames[i - 1]) if i > 0 else None
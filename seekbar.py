@@ -0,0 +1,93 @@
+import math, zlib
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+def labelColor(label):
+    ''' Same color for a label in every video and session. '''
+    return QtGui.QColor.fromHsv(zlib.crc32(label.encode()) % 360, 170, 220)
+
+
+class SeekBar(QtWidgets.QWidget):
+    ''' The frames of the current video from left to right, with the ranges of its Timeline drawn
+        in one lane per label, the current frame as a red line and the start of a range being
+        marked as a dashed one. Clicking or dragging seeks.
+    '''
+    seek = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(SeekBar, self).__init__(parent)
+        self.timeline = None
+        self.length = 0
+        self.position = 0
+        self.mark = None        # frame a range was started at
+        self.lanes = None       # QPixmap of the ranges, redrawn only when they or the size change
+        self.setMinimumHeight(24)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
+        self.setFocusPolicy(QtCore.Qt.NoFocus)
+
+    def setTimeline(self, timeline, length):
+        self.timeline, self.length = timeline, length
+        self.refresh()
+
+    def refresh(self):
+        ''' Redraw the ranges, after the timeline changed. '''
+        self.lanes = None
+        self.update()
+
+    def setPosition(self, frame):
+        self.position = frame
+        self.update()
+
+    def setMark(self, frame):
+        self.mark = frame
+        self.update()
+
+    def x(self, frame):
+        return frame * self.width() / max(self.length, 1)
+
+    def drawLanes(self):
+        pixmap = QtGui.QPixmap(self.size())
+        pixmap.fill(self.palette().color(QtGui.QPalette.Dark))
+        labels = sorted(self.timeline.labels) if self.timeline is not None and self.length > 0 else []
+        painter = QtGui.QPainter(pixmap)
+        height = self.height() / max(len(labels), 1)
+        for lane, label in enumerate(labels):
+            color, frame = labelColor(label), 0
+            found = self.timeline.nextRange(label, frame)
+            while found is not None:
+                start, end, _ = found
+                x0, x1 = self.x(start), self.x(end)
+                painter.fillRect(QtCore.QRectF(x0, lane * height, max(x1 - x0, 1), height), color)
+                # continue at the next pixel, so at most one range is looked up per pixel however many there are
+                frame = max(end, math.ceil((math.floor(x0) + 1) * self.length / max(self.width(), 1)))
+                found = self.timeline.nextRange(label, frame)
+        painter.end()
+        return pixmap
+
+    def resizeEvent(self, e):
+        self.lanes = None
+        super(SeekBar, self).resizeEvent(e)
+
+    def paintEvent(self, e):
+        if self.lanes is None:
+            self.lanes = self.drawLanes()
+        painter = QtGui.QPainter(self)
+        painter.drawPixmap(0, 0, self.lanes)
+        if self.length <= 0:
+            return
+        if self.mark is not None:
+            painter.setPen(QtGui.QPen(QtCore.Qt.black, 1, QtCore.Qt.DashLine))
+            painter.drawLine(QtCore.QLineF(self.x(self.mark), 0, self.x(self.mark), self.height()))
+        painter.setPen(QtGui.QPen(QtCore.Qt.red, 2))
+        painter.drawLine(QtCore.QLineF(self.x(self.position), 0, self.x(self.position), self.height()))
+
+    def frameAt(self, x):
+        return min(max(int(x * self.length / max(self.width(), 1)), 0), self.length - 1)
+
+    def mousePressEvent(self, e):
+        if self.length > 0 and e.button() == QtCore.Qt.LeftButton:
+            self.seek.emit(self.frameAt(e.x()))
+
+    def mouseMoveEvent(self, e):
+        if self.length > 0 and e.buttons() & QtCore.Qt.LeftButton:
+            self.seek.emit(self.frameAt(e.x()))
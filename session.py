@@ -0,0 +1,66 @@
+import os
+from collections import OrderedDict
+from dataset import videoName
+from decoders import openDecoder
+from prefetch import Prefetcher
+from videoindex import loadIndex
+
+POOL_SIZE = int(os.environ.get("VFS_VIDEO_POOL", 4))   # videos kept open at the same time
+
+
+class Clip:
+    ''' An open video: its decoder (owned by a Prefetcher, it remembers where it is), its index
+        and the frame that was last shown.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.name = videoName(path)
+        # true frame count, timestamps and keyframes; built once and then read from a sidecar
+        self.index = loadIndex(path)
+        self.decoder = openDecoder(path, index=self.index)
+        self.opened = self.decoder.opened
+        self.length, self.fps = self.decoder.length, self.decoder.fps
+        self.prefetcher = Prefetcher(self.decoder, self.length)
+        self.prefetcher.start()
+        self.frame = 0
+
+    def close(self):
+        self.prefetcher.cancel()
+
+
+class VideoSession:
+    ''' LRU pool of open clips. Opening a video that is still in the pool reuses its decoder,
+        so switching back to it skips probing the container and setting up the decoder, and
+        the decoder is still at the position it was left at. Only the current clip decodes
+        ahead, the others are parked with their buffers dropped.
+    '''
+    def __init__(self, size=POOL_SIZE):
+        self.size = max(1, size)
+        self.clips = OrderedDict()  # path -> Clip, most recently used last
+        self.opens, self.reuses = 0, 0
+
+    def open(self, path):
+        path = os.path.realpath(path)
+        clip = self.clips.pop(path, None)
+        if clip is None:
+            clip = Clip(path)
+            self.opens += 1
+        else:
+            self.reuses += 1
+        for other in self.clips.values():
+            other.prefetcher.park()
+        self.clips[path] = clip
+        while len(self.clips) > self.size:
+            self.clips.popitem(last=False)[1].close()
+        return clip
+
+    def __contains__(self, path):
+        return os.path.realpath(path) in self.clips
+
+    def close(self):
+        for clip in self.clips.values():
+            clip.close()
+        self.clips.clear()
+
+    def stats(self):
+        return {"open": len(self.clips), "opens": self.opens, "reuses": self.reuses}
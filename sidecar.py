@@ -0,0 +1,52 @@
+import os, hashlib, zipfile, zlib
+from dataset import atomicWrite
+
+CACHE_DIR = os.environ.get("VFS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "vfs"))
+
+
+PARTIAL_HASH = 1024**2  # bytes hashed at the start and at the end of the file
+
+
+def fingerprint(path):
+    ''' Identifies the content of a video file cheaply: size, mtime and a hash of its first and last MB. '''
+    st = os.stat(path)
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_HASH))
+        if st.st_size > PARTIAL_HASH:
+            f.seek(max(st.st_size - PARTIAL_HASH, PARTIAL_HASH))
+            digest.update(f.read(PARTIAL_HASH))
+    return f"{st.st_size}-{int(st.st_mtime)}-{digest.hexdigest()[:12]}"
+
+
+def sidecarPath(path, kind):
+    ''' Where per-video data of the given kind (e.g. "signatures") is stored: next to the video
+        if that folder is writable, else in CACHE_DIR. The name includes the fingerprint, so
+        a changed file never picks up stale data.
+    '''
+    name = f".{os.path.basename(path)}.{kind}.{fingerprint(path)}.npz"
+    folder = os.path.dirname(os.path.abspath(path))
+    if not os.access(folder, os.W_OK):
+        folder = CACHE_DIR
+        os.makedirs(folder, exist_ok=True)
+        name = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16] + name
+    return os.path.join(folder, name)
+
+
+def readSidecar(sidecar, *keys):
+    ''' The arrays keys of a sidecar file, or None when it is missing or unreadable (left truncated
+        by an interrupted write, say), so the caller builds it again.
+    '''
+    import numpy as np
+    try:
+        with np.load(sidecar) as f:
+            return tuple(f[k] for k in keys)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile, zlib.error):
+        return None
+
+
+def writeSidecar(sidecar, compressed=False, **arrays):
+    ''' Save arrays to a sidecar file with atomicWrite, so it is never seen half written. '''
+    import numpy as np
+    save = np.savez_compressed if compressed else np.savez
+    atomicWrite(sidecar, lambda f: save(f, **arrays))
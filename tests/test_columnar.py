@@ -0,0 +1,48 @@
+''' ColumnarDataset against Dataset, the engine it stands in for. '''
+import random
+import pytest
+from dataset import Dataset
+from columnar import ColumnarDataset
+from test_dataset import LABELS, randomOps
+
+
+def test_new_labels_grow_the_columns():
+    dataset = ColumnarDataset(["a"])
+    dataset.add_frame("v_1", {"a": 1, "b": 2})
+    dataset.add_frame("v_2", {"c": 3, "d": 1, "e": 5})
+    assert dataset.frames["v_1"] == {"a": 1, "b": 2}
+    assert dataset.frames["v_2"] == {"c": 3, "d": 1, "e": 5}
+    assert dataset.keys == {"a": 1, "b": 2, "c": 3, "d": 1, "e": 5}
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_dataset(tmp_path, seed):
+    rng = random.Random(seed)
+    expected, columnar = Dataset(list(LABELS)), ColumnarDataset(list(LABELS))
+    columnar.save(tmp_path)
+    for _ in range(5):
+        # the same random ops on both
+        state = rng.getstate()
+        randomOps(expected, rng, 40)
+        rng.setstate(state)
+        randomOps(columnar, rng, 40)
+        columnar.save(tmp_path)
+    for dataset in (columnar, ColumnarDataset.load(tmp_path, list(LABELS))):
+        assert dict(dataset.frames) == expected.frames
+        assert dataset.get_ordered() == expected.get_ordered()
+        for label in LABELS:
+            assert set(dataset.get_frames_for_label(label)) == set(expected.get_frames_for_label(label))
+        assert dataset.query(all=["cat"], none=["dog"], minCount={"fox": 2}) == expected.query(all=["cat"], none=["dog"], minCount={"fox": 2})
+
+
+def test_large_counts(tmp_path):
+    dataset = ColumnarDataset(["a"])
+    dataset.add_frame("v_1", {"a": 40000, "b": 2**31 - 1})
+    assert dataset.frames["v_1"] == {"a": 40000, "b": 2**31 - 1}
+    with pytest.raises(ValueError):
+        dataset.add_frame("v_1", {"a": 2**31})
+    # refused before anything changed, nothing of it is journaled
+    assert dataset.frames["v_1"] == {"a": 40000, "b": 2**31 - 1}
+    assert len(dataset.ops) == 1
+    dataset.save(tmp_path)
+    assert ColumnarDataset.load(tmp_path, ["a"]).frames["v_1"] == {"a": 40000, "b": 2**31 - 1}
@@ -0,0 +1,126 @@
+''' The inverted label index of Dataset against brute force scans of Dataset.frames, and journal replay after a crash. '''
+import builtins, json, os, random
+import pytest
+from dataset import Dataset
+
+LABELS = ["bird", "cat", "dog", "fox"]
+
+
+def randomOps(dataset, rng, n, names=60):
+    for _ in range(n):
+        name = f"video_{rng.randrange(names)}"
+        if name in dataset.frames and rng.random() < 0.4:
+            dataset.remove_frame(name)
+        else:
+            dataset.add_frame(name, {l: rng.randint(1, 3) for l in rng.sample(LABELS, rng.randint(0, 3))})
+
+
+def checkIndex(dataset):
+    for label in LABELS:
+        assert set(dataset.index.get(label, ())) == {f for f, labels in dataset.frames.items() if label in labels}
+        assert dataset.keys[label] == sum(labels.get(label, 0) for labels in dataset.frames.values())
+        assert dataset.count_frames_for_label(label) == len(dataset.index.get(label, ()))
+        assert sorted(dataset.get_frames_for_label(label)) == sorted(dataset.index.get(label, ()))
+
+
+def bruteQuery(dataset, q):
+    return {f for f, labels in dataset.frames.items()
+            if all(l in labels for l in q["all"])
+            and (not q["any"] or any(l in labels for l in q["any"]))
+            and not any(l in labels for l in q["none"])
+            and all(labels.get(l, 0) >= n for l, n in (q["minCount"] or {}).items())}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_matches_frames(seed):
+    rng = random.Random(seed)
+    dataset = Dataset(list(LABELS))
+    for _ in range(10):
+        randomOps(dataset, rng, 30)
+        checkIndex(dataset)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_index_after_journal_replay(tmp_path, seed):
+    rng = random.Random(seed)
+    dataset = Dataset(list(LABELS))
+    dataset.save(tmp_path)
+    for _ in range(5):
+        randomOps(dataset, rng, 40)
+        dataset.save(tmp_path)
+    assert (tmp_path / "data.journal").exists()
+    loaded = Dataset.load(tmp_path, list(LABELS))
+    assert loaded.frames == dataset.frames
+    checkIndex(loaded)
+    randomOps(loaded, rng, 40)
+    checkIndex(loaded)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_query(seed):
+    rng = random.Random(seed)
+    dataset = Dataset(list(LABELS))
+    randomOps(dataset, rng, 200)
+    for _ in range(50):
+        pick = lambda: rng.sample(LABELS, rng.randint(0, 2))
+        minCount = {l: rng.randint(1, 3) for l in pick()}
+        q = {"all": pick(), "any": pick(), "none": pick(), "minCount": minCount or None}
+        assert dataset.query(**q) == bruteQuery(dataset, q)
+
+
+def journaled(folder, n):
+    ''' A dataset saved to folder as a snapshot plus a journal of n add ops. '''
+    dataset = Dataset(list(LABELS))
+    dataset.save(folder)
+    for i in range(n):
+        dataset.add_frame(f"video_{i}", {"cat": i + 1})
+    dataset.save(folder)
+    return folder / "data.journal"
+
+
+def test_torn_last_line_is_cut_off(tmp_path):
+    journal = journaled(tmp_path, 2)
+    with open(journal, "a") as f:
+        f.write('{"op": "add", "name": "video_9", "lab')    # crashed mid-append
+    dataset = Dataset.load(tmp_path, list(LABELS))
+    assert sorted(dataset.frames) == ["video_0", "video_1"]
+    dataset.add_frame("video_2", {"dog": 1})
+    dataset.add_frame("video_3", {"dog": 2})
+    dataset.save(tmp_path)
+    loaded = Dataset.load(tmp_path, list(LABELS))
+    assert sorted(loaded.frames) == ["video_0", "video_1", "video_2", "video_3"]
+    checkIndex(loaded)
+
+
+def test_op_missing_its_newline_is_kept(tmp_path):
+    journal = journaled(tmp_path, 2)
+    with open(journal, "a") as f:
+        f.write(json.dumps({"op": "add", "name": "video_7", "labels": {"fox": 1}}))   # newline lost
+    dataset = Dataset.load(tmp_path, list(LABELS))
+    assert dataset.frames["video_7"] == {"fox": 1}
+    dataset.add_frame("video_8", {"fox": 2})
+    dataset.save(tmp_path)
+    assert all(json.loads(line) for line in journal.read_text().splitlines())
+    loaded = Dataset.load(tmp_path, list(LABELS))
+    assert loaded.frames["video_7"] == {"fox": 1} and loaded.frames["video_8"] == {"fox": 2}
+
+
+def test_read_only_journal_still_loads(tmp_path, monkeypatch):
+    journal = journaled(tmp_path, 2)
+    with open(journal, "a") as f:
+        f.write('{"op": "remove", "na')
+    before = journal.read_bytes()
+    realOpen = builtins.open
+
+    def readOnly(path, mode="r", *args, **kwargs):
+        # chmod does not stop root, so the journal is made read-only here
+        if os.path.abspath(path) == str(journal) and mode != "rb":
+            raise PermissionError(13, "Permission denied", str(path))
+        return realOpen(path, mode, *args, **kwargs)
+    monkeypatch.setattr(builtins, "open", readOnly)
+    dataset = Dataset.load(tmp_path, list(LABELS))
+    assert sorted(dataset.frames) == ["video_0", "video_1"]
+    assert journal.read_bytes() == before
+    dataset.add_frame("video_2", {"cat": 1})
+    with pytest.raises(PermissionError):
+        dataset.save(tmp_path)
@@ -0,0 +1,112 @@
+import os, hashlib, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5 import QtCore
+from PyQt5.QtGui import QImage
+from sidecar import CACHE_DIR
+from dataset import atomicWrite
+
+THUMB_DIR = os.path.join(CACHE_DIR, "thumbs")
+THUMB_WIDTH = 128       # pixels; rows show them at ICON_SIZE
+THUMB_FORMAT = "jpg"
+WORKERS = 4
+MEMORY = 2000           # thumbnails kept in memory
+
+
+def thumbKey(path):
+    ''' Cache key of the thumbnail of path. Stat based (path, size, mtime) so a hit never opens
+        the image itself; a rewritten image gets a new key.
+    '''
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}:{THUMB_WIDTH}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def thumbPath(key):
+    return os.path.join(THUMB_DIR, key[:2], f"{key}.{THUMB_FORMAT}")
+
+
+def makeThumbnail(path, out):
+    ''' Decode path at reduced size, shrink it to THUMB_WIDTH and write it to out. Returns the encoded bytes. '''
+    import cv2      # imported by the first worker that needs it, not at startup
+    img = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_4)   # JPEGs are decoded at 1/4 scale directly
+    if img is None or img.shape[1] < THUMB_WIDTH:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    h, w = img.shape[:2]
+    if w > THUMB_WIDTH:
+        img = cv2.resize(img, (THUMB_WIDTH, max(1, h * THUMB_WIDTH // w)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(f".{THUMB_FORMAT}", img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        return None
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    data = buf.tobytes()
+    atomicWrite(out, data)
+    return data
+
+
+class ThumbnailStore(QtCore.QObject):
+    ''' Serves small thumbnails of image files from an on-disk cache, generating missing ones
+        on a thread pool. get() answers from memory right away; request() schedules the rest
+        and ready(path, QImage) is emitted on the GUI thread when each one is available.
+    '''
+    ready = QtCore.pyqtSignal(str, QImage)
+
+    def __init__(self, workers=WORKERS, parent=None):
+        super(ThumbnailStore, self).__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnails")
+        self.memory = OrderedDict()     # path -> QImage
+        self.pending = set()
+        self.failed = set()             # paths that could not be read, until forget() is called
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            image = self.memory.get(path)
+            if image is not None:
+                self.memory.move_to_end(path)
+            return image
+
+    def request(self, path):
+        ''' Make sure ready will be emitted for path (now, if it is already in memory). '''
+        image = self.get(path)
+        if image is not None:
+            self.ready.emit(path, image)
+            return
+        with self.lock:
+            if path in self.pending or path in self.failed:
+                return
+            self.pending.add(path)
+        self.pool.submit(self._load, path)
+
+    def _load(self, path):
+        image = QImage()
+        try:
+            out = thumbPath(thumbKey(path))
+            if os.path.exists(out):
+                image.load(out)
+            else:
+                data = makeThumbnail(path, out)
+                if data is not None:
+                    image.loadFromData(data)
+        except OSError:
+            pass
+        with self.lock:
+            self.pending.discard(path)
+            if image.isNull():
+                self.failed.add(path)
+            else:
+                self.memory[path] = image
+                while len(self.memory) > MEMORY:
+                    self.memory.popitem(last=False)
+        if not image.isNull():
+            self.ready.emit(path, image)
+
+    def forget(self, path):
+        with self.lock:
+            self.memory.pop(path, None)
+            self.failed.discard(path)
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
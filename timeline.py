@@ -0,0 +1,115 @@
+import os, json
+from bisect import bisect_left, bisect_right
+from dataset import atomicWrite
+
+TIMELINE = "timeline.json"  # video name -> label -> [start, end, value] frame ranges
+
+
+class Timeline:
+    ''' Labels of the frames of one video as [start, end) ranges. Every label has its ranges in
+        three parallel lists sorted by start (they never overlap, and touching ranges with the
+        same value are merged), so the labels at a frame and the ranges of a label in a window
+        are found by bisection, whatever the length of the video.
+    '''
+    def __init__(self):
+        self.labels = {}    # label -> (starts, ends, values)
+
+    def __bool__(self):
+        return bool(self.labels)
+
+    def set(self, label, start, end, value):
+        ''' Give frames [start, end) value for label, 0 removes the label from them. '''
+        if end <= start:
+            return
+        starts, ends, values = self.labels.setdefault(label, ([], [], []))
+        # ranges overlapping or touching [start, end)
+        lo, hi = bisect_left(ends, start), bisect_right(starts, end)
+        pieces = []
+        if lo < hi and starts[lo] < start:
+            pieces.append((starts[lo], start, values[lo]))
+        if value:
+            pieces.append((start, end, value))
+        if lo < hi and ends[hi - 1] > end:
+            pieces.append((end, ends[hi - 1], values[hi - 1]))
+        merged = []
+        for s, e, v in pieces:
+            if merged and merged[-1][1] == s and merged[-1][2] == v:
+                merged[-1] = (merged[-1][0], e, v)
+            else:
+                merged.append((s, e, v))
+        starts[lo:hi] = [s for s, _, _ in merged]
+        ends[lo:hi] = [e for _, e, _ in merged]
+        values[lo:hi] = [v for _, _, v in merged]
+        if not starts:
+            del self.labels[label]
+
+    def labelsAt(self, frame):
+        ''' {label: value} of the ranges containing frame. '''
+        found = {}
+        for label, (starts, ends, values) in self.labels.items():
+            i = bisect_right(starts, frame) - 1
+            if i >= 0 and frame < ends[i]:
+                found[label] = values[i]
+        return found
+
+    def ranges(self, label, start=0, end=None):
+        ''' (start, end, value) of the ranges of label overlapping frames [start, end). '''
+        if label not in self.labels:
+            return []
+        starts, ends, values = self.labels[label]
+        lo = bisect_right(ends, start)
+        hi = len(starts) if end is None else bisect_left(starts, end)
+        return list(zip(starts[lo:hi], ends[lo:hi], values[lo:hi]))
+
+    def nextRange(self, label, frame):
+        ''' (start, end, value) of the range of label containing frame, or else of the first one
+            after it; None when there is none.
+        '''
+        if label not in self.labels:
+            return None
+        starts, ends, values = self.labels[label]
+        i = bisect_right(ends, frame)
+        return (starts[i], ends[i], values[i]) if i < len(starts) else None
+
+    def count(self, label):
+        ''' Number of frames carrying label. '''
+        starts, ends, _ = self.labels.get(label, ((), (), ()))
+        return sum(ends) - sum(starts)
+
+    def toDict(self):
+        return {label: [list(r) for r in zip(*lists)] for label, lists in self.labels.items()}
+
+    @classmethod
+    def fromDict(cls, d):
+        timeline = cls()
+        for label, ranges in d.items():
+            for s, e, v in sorted(ranges):
+                timeline.set(label, s, e, v)
+        return timeline
+
+
+class Timelines:
+    ''' The timelines of the videos whose frames are labelled in a dataset folder, kept in its timeline.json. '''
+    def __init__(self, folder):
+        self.folder = folder
+        self.videos = {}    # video name -> Timeline
+
+    @classmethod
+    def load(cls, folder):
+        timelines = cls(folder)
+        try:
+            with open(os.path.join(folder, TIMELINE)) as f:
+                d = json.load(f)
+        except (OSError, ValueError):
+            d = {}
+        timelines.videos = {video: Timeline.fromDict(labels) for video, labels in d.items()}
+        return timelines
+
+    def get(self, video):
+        if video not in self.videos:
+            self.videos[video] = Timeline()
+        return self.videos[video]
+
+    def save(self):
+        d = {video: t.toDict() for video, t in self.videos.items() if t}
+        atomicWrite(os.path.join(self.folder, TIMELINE), json.dumps(d, sort_keys=True))
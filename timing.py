@@ -0,0 +1,122 @@
+import os, time, json, csv, math, atexit, threading, functools
+
+TIMING = os.environ.get("VFS_TIMING", "")                          # 1 to time the hot path stages, status to also show them
+TIMING_OUT = os.environ.get("VFS_TIMING_OUT", "vfs_timing.json")   # written on exit, CSV if it ends in .csv
+RING = 4096                                                        # last samples kept per stage
+ENABLED = TIMING not in ("", "0")
+SHOW = TIMING == "status"
+COLUMNS = ["count", "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+
+
+class Histogram:
+    ''' Durations of one stage: the last RING samples in a preallocated ring buffer, percentiles
+        are only computed (by sorting a copy) when a summary is asked for.
+    '''
+    def __init__(self, size=RING):
+        self.samples = [0.0] * size
+        self.size = size
+        self.count, self.total = 0, 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples[self.count % self.size] = seconds
+            self.count += 1
+            self.total += seconds
+
+    def summary(self):
+        with self.lock:
+            count, total = self.count, self.total
+            data = sorted(self.samples[:min(count, self.size)])
+        if not data:
+            return None
+        pick = lambda q: 1000 * data[max(0, math.ceil(q * len(data)) - 1)]     # nearest rank
+        return {"count": count, "mean_ms": 1000 * total / count, "p50_ms": pick(0.5), "p95_ms": pick(0.95),
+                "p99_ms": pick(0.99), "max_ms": 1000 * data[-1]}
+
+
+stages = {}     # stage name -> Histogram
+
+
+def record(name, seconds):
+    h = stages.get(name)
+    if h is None:
+        h = stages.setdefault(name, Histogram())
+    h.add(seconds)
+
+
+class Stage:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *args):
+        record(self.name, time.perf_counter() - self.t0)
+
+
+class NoStage:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+NO_STAGE = NoStage()
+
+
+def stage(name):
+    ''' Context manager timing its block as stage name, a shared no-op when timing is off. '''
+    return Stage(name) if ENABLED else NO_STAGE
+
+
+def timed(name):
+    ''' Decorator timing every call as stage name. When timing is off the function is returned
+        as is, so it costs nothing. Slots connected to signals with arguments (clicked(bool))
+        need a @pyqtSlot() on top, PyQt would pass those arguments through the wrapper.
+    '''
+    def decorate(func):
+        if not ENABLED:
+            return func
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+
+def summary():
+    return {name: s for name, s in ((name, stages[name].summary()) for name in sorted(stages)) if s is not None}
+
+
+def statusText(names):
+    ''' "stage p50/p95 ms" of the given stages, for the status bar. '''
+    s = summary()
+    return " | ".join(f"{name} {s[name]['p50_ms']:.1f}/{s[name]['p95_ms']:.1f} ms" for name in names if name in s)
+
+
+def dump(path=TIMING_OUT):
+    ''' Write the summary of every stage to path, as CSV if it ends in .csv and JSON otherwise. '''
+    rows = summary()
+    if not rows:
+        return
+    with open(path, "w", newline="") as f:
+        if path.endswith(".csv"):
+            w = csv.writer(f)
+            w.writerow(["stage"] + COLUMNS)
+            for name, s in rows.items():
+                w.writerow([name] + [round(s[c], 3) for c in COLUMNS])
+        else:
+            json.dump(rows, f, indent=1)
+
+
+if ENABLED:
+    atexit.register(dump)
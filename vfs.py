@@ -2,35 +2,82 @@
 
 ''' A basic GUi to use ImageViewer class to show its functionalities and use cases. '''
 
-from PyQt5 import QtCore, QtGui, uic
+from PyQt5 import QtCore, QtGui
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtWidgets import QFileDialog
 from PyQt5.QtGui import QPixmap
-import cv2
-import numpy as np
-import glob
-from PIL import Image
-import matplotlib.pyplot as plt
-import imageio
+import glob, hashlib, io, threading
 from viewer import ImageViewer
+from framecache import FrameCache
+from dataset import Dataset, atomicWrite, frameName, labelNames, loadSources, saveSources
+from thumbs import ThumbnailStore
+from imagelist import ImageListModel
+from folderindex import FolderIndex
+from timeline import Timelines
+from seekbar import SeekBar
+import timing
+from timing import timed
 import sys, os
-import json
 DIR = os.path.dirname(os.path.realpath(__file__))
-gui = uic.loadUiType(f"{DIR}/vfs.ui")[0]     # load UI file designed in Qt Designer
-VALID_FORMAT = ('.BMP', '.GIF', '.JPG', '.JPEG', '.PNG', '.PBM', '.PGM', '.PPM', '.TIFF', '.XBM')  # Image formats supported by Qt
+# OpenCV, NumPy and PyAV are imported where they are first needed (video, saving, smart jumping, thumbnail
+# workers) rather than here, so the window comes up without waiting for them
+FRAME_CACHE_MB = int(os.environ.get("VFS_FRAME_CACHE_MB", 1024))   # budget of the decoded frame cache
+FRAME_FORMAT = os.environ.get("VFS_FRAME_FORMAT", "jpg")             # jpg, png or webp for saved frames
+FRAME_QUALITY = int(os.environ.get("VFS_FRAME_QUALITY", 95))         # jpg/webp quality of saved frames
+if os.environ.get("VFS_DATASET") == "columnar":                        # NumPy backed engine for very large folders
+    from columnar import ColumnarDataset as Dataset
+ICON_SIZE = QtCore.QSize(96, 54)                                     # thumbnails in the image list
+TIMING_STAGES = ("vfs.loadVideoFrame", "prefetch.get", "viewer.update_image", "vfs.saveFrame")  # shown with VFS_TIMING=status
+RESCAN_DELAY = 500                                                   # ms of quiet after a folder change before it is diffed
+
+def loadUi():
+    ''' The Ui class of vfs.ui (designed in Qt Designer). It is compiled once to vfs_ui.py, and again
+        whenever vfs.ui changes, so a start only imports it; uic.loadUiType, which parses the .ui on
+        every start, is the fallback when that module cannot be written. The compiled icon paths are
+        absolute, so vfs_ui.py is not committed and is also recompiled when the checkout moves.
+    '''
+    ui, compiled = f"{DIR}/vfs.ui", f"{DIR}/vfs_ui.py"
+    with open(ui, "rb") as f:
+        header = f"# compiled from {ui} {hashlib.sha1(f.read()).hexdigest()}, do not edit\n"
+    try:
+        with open(compiled) as f:
+            fresh = f.readline() == header
+    except OSError:
+        fresh = False
+    try:
+        if not fresh:
+            from PyQt5 import uic
+            code = io.StringIO()
+            code.write(header)
+            uic.compileUi(ui, code)
+            atomicWrite(compiled, code.getvalue())
+        from vfs_ui import Ui_MainWindow
+        return Ui_MainWindow
+    except (OSError, ImportError):
+        from PyQt5 import uic
+        return uic.loadUiType(ui)[0]
+
+gui = loadUi()
+
+def readFolder(folder):
+    ''' What selectDir shows of a dataset folder: its labels, image listing, video sources and label ranges. Runs on a worker thread. '''
+    index = FolderIndex(folder)
+    entries = index.scan()
+    return {"folder": folder, "dataset": Dataset.load(folder, labelNames(folder)), "index": index,
+            "entries": entries, "sources": loadSources(folder), "timelines": Timelines.load(folder)}
+
+def tryReadFolder(folder):
+    ''' readFolder(folder), or {"folder", "error"} when it cannot be read (a corrupt data.json, say), so a
+        failure on the worker thread still reaches showFolder.
+    '''
+    try:
+        return readFolder(folder)
+    except Exception as err:
+        return {"folder": folder, "error": err}
 
 def getImages(folder):
     ''' Get the names and paths of all the images in a directory. '''
-    image_list = []
-    if os.path.isdir(folder):
-        files = [f for f in os.listdir(folder) if f.upper().endswith(VALID_FORMAT)]
-        files = sorted(files,key=lambda x: int(x.split(".")[0].split("_")[-1]))
-        for i,file in enumerate(files):
-            im_path = os.path.join(folder, file)
-            name = file.split(".")[0]
-            image_obj = {'name': name, 'path': im_path,"qitem":QtWidgets.QListWidgetItem(name)}
-            image_list.append(image_obj)
-    return sorted(image_list,key=lambda x: x["name"])
+    return FolderIndex(folder).scan()
 
 class QCustomQWidget (QtWidgets.QWidget):
     def __init__ (self, parent = None):
@@ -64,76 +111,17 @@ class QCustomQWidget (QtWidgets.QWidget):
     def setTextDown (self, text):
         self.name = text
         self.lbl_name.setText(text)
-    def setIcon (self, imagePath):
-        img = QtGui.QPixmap(imagePath)
+    def setIcon (self, image):
+        ''' image is a QImage thumbnail from the ThumbnailStore, never the full size key image. '''
+        img = QtGui.QPixmap.fromImage(image)
         img = img.scaledToWidth(64)
         self.iconQLabel.setPixmap(img)
 
-class Dataset:
-    def __init__(self,keys):
-        self.keys = {k:0 for k in keys}
-        self._keys = keys
-        self.frames = {}
-        self.nlabels = len(keys)
-    
-    def get_ordered(self):
-        return [self.keys[k] for k in self._keys]
-    def get_frames_for_label(self,label):
-        lst = []
-        for k,v in self.frames.items():
-            if label in v:
-                lst.append(k)
-        return lst
-
-    def add_frame(self,name,labels):
-        if name in self.frames:
-            currentLabels = self.frames[name]
-            for k,v in currentLabels.items():
-                self.keys[k] -= v
-
-        for k,v in labels.items():
-            self.keys[k] += v
-        self.frames[name] = labels
-    def remove_frame(self,name):
-        for k,v in self.frames[name].items():
-            self.keys[k] -= v
-        self.frames.pop(name)
-    @classmethod
-    def load(cls,folder,names):
-        f = f"{folder}/data.json"
-        dataset = Dataset(names)
-        if os.path.exists(f):
-            with open(f"{folder}/data.json") as f:
-                dd = json.load(f)
-            dataset.frames = dd["frames"]
-            dataset.nlabels = dd["nlabels"]
-            dataset.keys = dd["keys"]
-            dataset._keys = dd["keys_list"]
-        return dataset
-    def save(self,folder):
-        dataset = {
-            "keys": self.keys,
-            "frames": self.frames,
-            "keys_list": self._keys,
-            "nlabels": self.nlabels
-        }
-        keys = {}
-        for f,v in self.frames.items():
-            for k,v2 in v.items():
-                if k in keys:
-                    keys[k] += v2
-                else:
-                    keys[k] = v2
-        for k in self._keys:
-            if k not in keys:
-                keys[k] = 0
-        dataset["keys"] = keys
-        
-        with open(f"{folder}/data.json","w") as f:
-            f.write(json.dumps(dataset,indent=4))
-
 
 class Iwindow(QtWidgets.QMainWindow, gui):
+    frameWritten = QtCore.pyqtSignal(str, bool)     # emitted by the writer, always delivered later on the GUI thread
+    folderLoaded = QtCore.pyqtSignal(object)        # tryReadFolder() result, emitted from the folder loading thread
+
     def __init__(self, parent=None):
         QtWidgets.QMainWindow.__init__(self, parent)
         self.setupUi(self)
@@ -141,16 +129,43 @@ class Iwindow(QtWidgets.QMainWindow, gui):
         self.cntr, self.numImages = -1, -1  # self.cntr have the info of which image is selected/displayed
 
         self.image_viewer = ImageViewer(self.qlabel_image)
+        self.thumbs = ThumbnailStore(parent=self)
+        self.imageModel = ImageListModel(self.thumbs, parent=self)   # rows of qlist_images
+        self.qlist_images.setModel(self.imageModel)
+        self.folderIndex = None
+        self.watcher = QtCore.QFileSystemWatcher(self)
+        self.rescanTimer = QtCore.QTimer(self)
+        self.rescanTimer.setSingleShot(True)
+        self.rescanTimer.setInterval(RESCAN_DELAY)
+        self.seekBar = SeekBar(self)    # label ranges of the current video, under it
+        self.verticalLayout.addWidget(self.seekBar)
         self.__connectEvents()
+        if timing.SHOW:
+            # p50/p95 of the hot path, refreshed once a second at the right of the status bar
+            self.timingLabel = QtWidgets.QLabel()
+            self.statusbar.addPermanentWidget(self.timingLabel)
+            self.timingTimer = QtCore.QTimer(self)
+            self.timingTimer.timeout.connect(lambda: self.timingLabel.setText(timing.statusText(TIMING_STAGES)))
+            self.timingTimer.start(1000)
         self.showMaximized()
         self.videoFrameCount = -1
         self.videoLoaded = False
         self.vidlength = -1
-        self.nameItemDict = {}
+        self.session = None         # VideoSession, made when the first video is opened
+        self.clip = None            # current video of the session
+        self.prefetcher = None      # decoder of the current clip
+        self.scenes = None
+        self.frameCache = FrameCache(FRAME_CACHE_MB * 1024**2)
+        self.writer = None          # FrameWriter, made when the first frame is saved
+        self.labelWidgets = {}      # key image path -> QCustomQWidget showing it
         self.dataset = None
         
-        self.imagesList = {}
         self.folder = None
+        self.loadingFolder = None   # folder being read by readFolder on a worker thread
+        self.sources = {}           # video name -> path, for the frames in the folder
+        self.timelines = None       # Timelines of the folder, label ranges by video
+        self.timeline = None        # Timeline of the current video
+        self.rangeStart = None      # frame a label range was started at with [
         self.locked = True
 
         self.refreshLabels()
@@ -165,41 +180,34 @@ class Iwindow(QtWidgets.QMainWindow, gui):
         self.prev_im.clicked.connect(self.prevImg)
         self.save_frame.clicked.connect(self.saveFrame)
         self.pb_refresh.clicked.connect(self.refreshLabels)
-        self.qlist_images.itemClicked.connect(self.itemClick)
-        self.qlist_images.itemSelectionChanged.connect(self.changeImg)
+        self.qlist_images.clicked.connect(self.itemClick)
+        self.qlist_images.selectionModel().currentRowChanged.connect(self.changeImg)
         self.ls_labels.itemSelectionChanged.connect(self.update_data_for_label)
         self.goFrame.clicked.connect(self.goToFrame)
         self.pb_lockUnlock.clicked.connect(self.lockUnlock)
+        # queued even when emitted on the GUI thread (a write that finished before submit() returned),
+        # so a report never arrives before saveFrame marked the row pending
+        self.frameWritten.connect(self.onFrameWritten, QtCore.Qt.QueuedConnection)
+        self.folderLoaded.connect(self.showFolder)
+        self.smartJump.toggled.connect(self.toggleSmart)
+        self.thumbs.ready.connect(self.onThumbnail)
+        self.seekBar.seek.connect(self.seekTo)
+        self.watcher.directoryChanged.connect(self.rescanTimer.start)
+        self.rescanTimer.timeout.connect(self.syncFolder)
+        self.qlist_images.setIconSize(ICON_SIZE)
     
     def on_ln_search_key_textChanged(self):
-        t = self.ln_search_key.text()
+        t = self.ln_search_key.text().strip()
         ls = self.ls_labels
-        if t.strip() == "":
-            for index in range(self.ls_labels.count()):
-                ls.setRowHidden(index, False)
-            return
         for index in range(ls.count()):
-            item = ls.item(index)
-            itemWidget = self.ls_labels.itemWidget(item)
-            name = itemWidget.name
-            if t not in name:
-                ls.setRowHidden(index, True)
-            else:
-                ls.setRowHidden(index, False)
+            hide = t != "" and t not in self.labelNames[index]
+            # only touch rows whose visibility changes, each setRowHidden relayouts the list
+            if ls.isRowHidden(index) != hide:
+                ls.setRowHidden(index, hide)
 
     def on_ln_search_images_textChanged(self):
-        t = self.ln_search_images.text()
-        ls = self.qlist_images
-        if t.strip() == "":
-            for index in range(self.qlist_images.count()):
-                ls.setRowHidden(index, False)
-            return
-        for index in range(ls.count()):
-            name = self.qlist_images.item(index).text()
-            if t not in name:
-                ls.setRowHidden(index, True)
-            else:
-                ls.setRowHidden(index, False)
+        self.imageModel.setFilter(self.ln_search_images.text())
+        self.numImages = len(self.imageModel)
         
 
     def lockUnlock(self):
@@ -211,10 +219,13 @@ class Iwindow(QtWidgets.QMainWindow, gui):
             self.locked = True
         else:
             self.pb_lockUnlock.setText("lock")
-            self.ls_labels.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+            # ctrl/shift-click selects several labels, the images shown have all of them
+            self.ls_labels.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
             self.ls_labels.setCurrentRow(0)
             self.locked = False
             
+    @QtCore.pyqtSlot()
+    @timed("vfs.refreshLabels")
     def refreshLabels(self):
         if self.folder is None:
             return 
@@ -222,21 +233,22 @@ class Iwindow(QtWidgets.QMainWindow, gui):
         labels = sorted(glob.glob(f"{path}/*"))
         self.names = sorted([os.path.basename(f).replace(".png","").replace(".jpeg","") for f in labels])
         self.ls_labels.clear()
+        self.labelWidgets = {}
+        self.labelNames = []        # name of each ls_labels row, for filtering without touching the widgets
         if not self.dataset:
             self.dataset = Dataset(self.names)
         else:
             for n in self.names:
-                if n not in self.dataset._keys:
-                    self.dataset._keys.append(n)
-                    self.dataset._keys = sorted(self.dataset._keys)
-                    self.dataset.nlabels += 1
-                    self.dataset.keys[n] = 0
+                self.dataset.add_key(n)
             self.dataset.save(self.folder)
+            self.settleFolder()
         for index, name, icon in zip(range(len(labels)),self.names,labels):
                 # Create QCustomQWidget
                 myQCustomQWidget = QCustomQWidget()
                 myQCustomQWidget.setTextDown(name)
-                myQCustomQWidget.setIcon(icon)
+                self.labelWidgets[icon] = myQCustomQWidget
+                self.labelNames.append(name)
+                self.thumbs.request(icon)
                 # 
                 myQCustomQWidget.currentCountLabel.setText(str(self.dataset.keys[name]))
                 myQCustomQWidget.currentCount = self.dataset.keys[name]
@@ -250,116 +262,233 @@ class Iwindow(QtWidgets.QMainWindow, gui):
        
     def delete_img(self):
         try:
-            index = int(self.qlist_images.currentRow())
-            path = self.imagesList[index]['path']
+            index = int(self.qlist_images.currentIndex().row())
+            entry = self.imageModel.entry(index)
+            path = entry['path']
             os.remove(path)
-            item = self.imagesList[index]["qitem"]
-            fname = self.qlist_images.currentItem().text()
+            self.folderIndex.remove(path)
+            fname = entry['name']
             self.dataset.remove_frame(fname)
             for i,v in zip(range(self.dataset.nlabels),self.dataset.get_ordered()):
                 lblitem = self.ls_labels.itemWidget(self.ls_labels.item(i))
                 lblitem.currentCountLabel.setText(str(v))
-            item.setForeground(QtCore.Qt.red)
+            self.imageModel.setState(fname, "deleted")
             self._changeImage()    
         except:
             pass
         self.dataset.save(self.folder)
+        self.settleFolder()
     
     def updateImageList(self,label=None,reload=False):
         if self.dataset is None:
             return
-        for i in range(self.qlist_images.count()):
-            self.qlist_images.takeItem(0)
 
         if reload:
-            self.imagesList = getImages(self.folder) 
+            index = FolderIndex(self.folder)
+            self.setFolderIndex(index, index.scan())
         
         if label is None:
-            currentImgs = self.imagesList        
+            self.imageModel.setSubset(None)
         else:
-            currentImgsFrames = self.dataset.get_frames_for_label(label)
-            currentImgs = [img for img in self.imagesList if img["name"] in currentImgsFrames]
+            labels = [label] if isinstance(label, str) else label
+            self.imageModel.setSubset(self.dataset.query(all=labels))
         
-        self.numImages = len(currentImgs)
-        self.currentImgs = currentImgs
-        # make qitems of the image names
-        for i,img in enumerate(self.currentImgs):
-            self.qlist_images.addItem(img["qitem"])
-            self.nameItemDict[img["name"]] = img["qitem"]
+        self.numImages = len(self.imageModel)
 
         self.cntr = 0
         # display first image and enable Pan 
         if self.numImages > 1: 
-            self.image_viewer.loadImage(currentImgs[self.cntr]['path'])
-            self.imagesList[self.cntr]["qitem"].setSelected(True)
+            self.image_viewer.loadImage(self.imageModel.entry(self.cntr)['path'])
+            self.qlist_images.setCurrentIndex(self.imageModel.index(self.cntr))
 
         # enable the next image button on the gui if multiple images are loaded
         if self.numImages > 1:
             self.next_im.setEnabled(True)
 
-    def selectDir(self):
+    def setFolderIndex(self, index, entries):
+        ''' List the images of index (entries as returned by its scan) and watch its folder for changes. '''
+        self.folderIndex = index
+        self.imageModel.setEntries(entries)
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.watcher.addPath(index.folder)
+
+    def settleFolder(self):
+        ''' The program wrote to the folder itself (data.json, videos.json, timeline.json), that needs no rescan. '''
+        if self.folderIndex is not None and self.folderIndex.folder == self.folder:
+            self.folderIndex.settle()
+
+    def syncFolder(self):
+        ''' Apply changes made to the folder outside of saveFrame/delete_img, without a full reload. '''
+        if self.folderIndex is None:
+            return
+        added, removed = self.folderIndex.refresh()
+        for entry in added:
+            if entry["name"] not in self.imageModel:
+                self.imageModel.append(entry)
+            else:
+                self.imageModel.setState(entry["name"], None)
+        for entry in removed:
+            self.imageModel.setState(entry["name"], "deleted")
+        self.numImages = len(self.imageModel)
+
+    def onThumbnail(self, path, image):
+        if path in self.labelWidgets:
+            self.labelWidgets[path].setIcon(image)
+        self.imageModel.thumbnailReady(path)
+
+    def selectDir(self, wait=False):
         ''' Select a directory, make list of images in it and display the first image in the list. '''
         # open 'select folder' dialog box
-        self.folder = str(QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory"))
-        if not self.folder:
+        folder = str(QtWidgets.QFileDialog.getExistingDirectory(self, "Select Directory"))
+        if not folder:
             QtWidgets.QMessageBox.warning(self, 'No Folder Selected', 'Please select a valid Folder')
             return
+        self.openFolder(folder, wait)
+
+    def openFolder(self, folder, wait=False):
+        ''' Read folder on a worker thread and show it when done, so the window stays responsive
+            on large folders. With wait it is read and shown before returning.
+        '''
+        self.loadingFolder = folder
+        if wait:
+            self.showFolder(tryReadFolder(folder))
+            return
+        self.statusbar.showMessage(f"Loading {folder} ...")
+        threading.Thread(target=lambda: self.folderLoaded.emit(tryReadFolder(folder)), daemon=True).start()
+
+    def showFolder(self, loaded):
+        if loaded["folder"] != self.loadingFolder:
+            return      # another folder was selected while this one was read
+        self.loadingFolder = None
+        if "error" in loaded:
+            self.statusbar.clearMessage()
+            QtWidgets.QMessageBox.warning(self, 'Could not open folder', f"{loaded['folder']}:\n{loaded['error']}")
+            return
+        self.folder = loaded["folder"]
+        self.dataset = loaded["dataset"]
+        self.sources = loaded["sources"]
+        self.timelines = loaded["timelines"]
+        self.showTimeline()
         self.refreshLabels()
-        self.dataset = Dataset.load(self.folder,self.names)
-        self.updateImageList(label=None,reload=True)
+        self.setFolderIndex(loaded["index"], loaded["entries"])
+        self.updateImageList(label=None)
 
         for i,v in zip(range(self.dataset.nlabels),self.dataset.get_ordered()):
                 lblitem = self.ls_labels.itemWidget(self.ls_labels.item(i))
                 lblitem.currentCountLabel.setText(str(v))
-        self.qlist_images.setCurrentRow(0)
+        self.qlist_images.setCurrentIndex(self.imageModel.index(0))
         self.changeImg()
+        self.statusbar.showMessage(f"{self.folder}: {len(self.imageModel)} images")
         
     def loadVideo(self):
-        self.videofile = str(QFileDialog.getOpenFileName(None, 'Open File', '.')[0])
+        path = str(QFileDialog.getOpenFileName(None, 'Open File', '.')[0])
         
-        if not self.videofile:
+        if not path:
             QtWidgets.QMessageBox.warning(self, 'No file selected', 'Please select a valid video file')
             return
-        self.videoName = os.path.basename(self.videofile).split(".")[0]
-        self.cap = cv2.VideoCapture(self.videofile)
-        self.videoLoaded = True
-        self.vidlength = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        self.fps = int(self.cap.get(cv2.CAP_PROP_FPS))
-        if (self.cap.isOpened()== False):
+        self.openVideo(path)
+
+    def openVideo(self, path, frame=None):
+        ''' Make path the current video and show frame, by default the one it was left at.
+            Videos still open in the session are switched to without reopening them.
+        '''
+        if self.clip is not None:
+            self.clip.frame = self.videoFrameCount
+        if self.session is None:
+            from session import VideoSession
+            self.session = VideoSession()
+        self.clip = self.session.open(path)
+        if not self.clip.opened:
             print("Error opening video stream or file")
-        self.videoFrameCount = 0
+        self.videofile, self.videoName = self.clip.path, self.clip.name
+        self.videoIndex, self.vidlength, self.fps = self.clip.index, self.clip.length, self.clip.fps
+        # the prefetcher owns the capture, decoding ahead on its own thread
+        self.prefetcher = self.clip.prefetcher
+        self.videoLoaded = True
+        self.videoFrameCount = self.clip.frame if frame is None else min(max(frame, 0), max(self.vidlength - 1, 0))
+        self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
+        self.rangeStart = None
+        self.seekBar.setMark(None)
+        self.showTimeline()
+        self.toggleSmart()
         self.loadVideoFrame()
+        self.update_labels()
+
+    def showTimeline(self):
+        ''' Show the label ranges of the current video in the seek bar. '''
+        self.timeline = self.timelines.get(self.videoName) if self.timelines is not None and self.videoLoaded else None
+        self.seekBar.setTimeline(self.timeline, self.vidlength if self.videoLoaded else 0)
+
+    def showSource(self, entry):
+        ''' Reopen the video a sampled frame came from, at that frame. '''
+        if entry is None or entry.get("frame") is None:
+            return
+        path = self.sources.get(entry["video"])
+        if path is not None and os.path.exists(path):
+            self.openVideo(path, entry["frame"])
+
+    def toggleSmart(self):
+        ''' Start the scene signature pass for the current video when smart jumping is switched on. '''
+        if self.scenes is not None and (not self.smartJump.isChecked() or self.scenes.path != self.videofile):
+            self.scenes.cancel()
+            self.scenes = None
+        if self.smartJump.isChecked() and self.videoLoaded and self.scenes is None:
+            from scenes import SceneIndex
+            self.scenes = SceneIndex(self.videofile)
+            self.scenes.start()
+
+    def frameStep(self, forward):
+        ''' Frames to move by: the fixed jump, or in smart mode the distance to the next/previous
+            proposed frame (0 when there is none left). Falls back to the jump while proposals are computed.
+        '''
+        if self.smartJump.isChecked() and self.scenes is not None and self.scenes.frames is not None:
+            target = self.scenes.next(self.videoFrameCount) if forward else self.scenes.prev(self.videoFrameCount)
+            return 0 if target is None else abs(target - self.videoFrameCount)
+        return int(self.videoJump.text())
     
-    def loadVideoFrame(self):
+    @timed("vfs.loadVideoFrame")
+    def loadVideoFrame(self, jump=None):
         if not self.videoLoaded:
             return
 
-        self.cap.set(1,self.videoFrameCount)
-        ret, frame = self.cap.read()
-        if ret == True:
-            frame = frame.astype(np.uint8)
-            frame = cv2.cvtColor(frame,cv2.COLOR_BGRA2RGB)
+        key = (self.videofile, self.videoFrameCount)
+        frame = self.frameCache.get(key)
+        if frame is None:
+            frame = self.prefetcher.get(self.videoFrameCount, jump)
+            self.frameCache.put(key, frame)
+        else:
+            # keep the read-ahead window following the user even when served from the cache
+            self.prefetcher.retarget(self.videoFrameCount, jump)
+        if frame is not None:
             self.vidframe = frame
-            self.image_viewer.loadImagePIL(Image.fromarray(frame))
+            self.image_viewer.loadArray(frame, bgr=True)
+        self.seekBar.setPosition(self.videoFrameCount)
+        st, cs = self.prefetcher.stats(), self.frameCache.stats()
+        smart = ""
+        if self.scenes is not None:
+            smart = f" | smart: {len(self.scenes.frames)} proposals" if self.scenes.frames is not None else f" | smart: scanning {self.scenes.done}/{self.vidlength}"
+        self.statusbar.showMessage(f"{self.clip.decoder.name} | prefetch hits {st['hits']} misses {st['misses']} buffered {st['frames']} ({st['bytes']//1024**2} MB) | "
+                                   f"cache hits {cs['hits']} misses {cs['misses']} frames {cs['frames']} ({cs['bytes']//1024**2}/{self.frameCache.maxBytes//1024**2} MB)" + smart)
 
     def nextFrame(self):
         if not self.videoLoaded:
             return
-        jump = int(self.videoJump.text())
-        if self.videoFrameCount + jump < self.vidlength:
+        jump = self.frameStep(True)
+        if jump and self.videoFrameCount + jump < self.vidlength:
             self.videoFrameCount += jump
             self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
-            self.loadVideoFrame()
+            self.loadVideoFrame(jump)
             self.update_labels()
     
     def prevFrame(self):
         if not self.videoLoaded:
             return
-        jump = int(self.videoJump.text())
-        if self.videoFrameCount - jump >= 0:
+        jump = self.frameStep(False)
+        if jump and self.videoFrameCount - jump >= 0:
             self.videoFrameCount -= jump
             self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
-            self.loadVideoFrame()
+            self.loadVideoFrame(-jump)
             self.update_labels()
     
     def nextImg(self):
@@ -376,6 +505,7 @@ class Iwindow(QtWidgets.QMainWindow, gui):
         else:
             QtWidgets.QMessageBox.warning(self, 'Sorry', 'No previous Image!')
 
+    @timed("vfs.update_label_list")
     def update_label_list(self,name):
         labels = {}
         for i in range(self.dataset.nlabels):
@@ -393,37 +523,62 @@ class Iwindow(QtWidgets.QMainWindow, gui):
             item = self.ls_labels.itemWidget(self.ls_labels.item(i))
             item.currentCountLabel.setText(str(self.dataset.keys[item.name]))
             
+    @QtCore.pyqtSlot()
+    @timed("vfs.saveFrame")
     def saveFrame(self):
         if not self.folder:
-            self.selectDir()
+            self.selectDir(wait=True)
         if not self.folder:
             return
+        if self.writer is None:
+            from writer import FrameWriter
+            self.writer = FrameWriter(FRAME_FORMAT, FRAME_QUALITY, done=self.frameWritten.emit)
         idx,fps = self.videoFrameCount, self.fps
         time = str(round(idx/fps,4)).replace(".","_")
-        fname = f"{self.videoName}_{str(idx)}"
-        imageio.imwrite(f"{self.folder}/{fname}.jpg", self.vidframe)
-        if fname not in self.nameItemDict.keys():
-            item = QtWidgets.QListWidgetItem(fname)
-            self.imagesList += [{"name":fname,"path":f"{self.folder}/{fname}.jpg","qitem": item}]
-            self.nameItemDict[fname] = item
-            self.qlist_images.addItem(item)
-            self.numImages += 1
+        fname = frameName(self.videoName, idx)
+        frame = self.frameCache.get((self.videofile, idx))
+        if frame is None:
+            frame = self.vidframe
+        path = f"{self.folder}/{fname}.{self.writer.ext}"
+        entry = self.folderIndex.add(path)
+        if fname not in self.imageModel:
+            self.imageModel.append(entry)
+            self.numImages = len(self.imageModel)
         else:
-            self.nameItemDict[fname].setForeground(QtCore.Qt.black)
-            #self.nameItemDict[fname].setSelected(True)
             self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
-            self.cntr = int(self.qlist_images.currentRow())
+            self.cntr = int(self.qlist_images.currentIndex().row())
+        # shown as pending until the writer reports the file landed; set before submitting since
+        # a write that finishes first calls back synchronously
+        self.imageModel.setState(fname, "pending")
+        # encoded from the full resolution BGR frame on a writer thread
+        self.writer.submit(path, frame)
+        if self.sources.get(self.videoName) != self.videofile:
+            self.sources[self.videoName] = self.videofile
+            saveSources(self.folder, self.sources)
         self.update_label_list(fname)
         self.dataset.save(self.folder)
+        self.settleFolder()
+
+    def onFrameWritten(self, path, ok):
+        name = os.path.basename(path).split(".")[0]
+        if self.folderIndex is not None and self.folderIndex.folder == os.path.dirname(path):
+            self.folderIndex.written(path, ok)
+        if name in self.imageModel:
+            self.imageModel.setState(name, None if ok else "failed")
+            if ok:
+                # the file is new or rewritten, its old thumbnail (if any) is stale
+                self.thumbs.forget(path)
+                self.thumbs.request(path)
 
     def changeImg(self):
-        index = int(self.qlist_images.currentRow())
+        index = int(self.qlist_images.currentIndex().row())
         self.cntr = index
         self._changeImage()
         
-        if self.qlist_images.currentItem() is None:
+        entry = self.imageModel.entry(index)
+        if entry is None:
             return
-        name = self.qlist_images.currentItem().text()
+        name = entry["name"]
         #frameN = int(name.split("frame",""))
         #self.videoFrameCount = frameN
         #self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
@@ -439,27 +594,38 @@ class Iwindow(QtWidgets.QMainWindow, gui):
                 item.currentAddText.setText("0") 
 
     def update_data_for_label(self):
-        if self.ls_labels.currentItem() is None:
+        items = self.ls_labels.selectedItems()
+        if not items:
             return
         
-        idx = int(self.ls_labels.currentRow())
-        item = self.ls_labels.itemWidget(self.ls_labels.item(idx))
-        label = item.name
+        labels = [self.ls_labels.itemWidget(item).name for item in items]
         
-        self.updateImageList(label=label,reload=False)
+        self.updateImageList(label=labels,reload=False)
         
-    def itemClick(self, item):
-        self.cntr = int(self.qlist_images.currentRow())
+    def itemClick(self, index):
+        self.cntr = int(index.row())
         self._changeImage()
+        self.showSource(self.imageModel.entry(self.cntr))
 
     def _changeImage(self):
-        if len(self.currentImgs) <= 0:
+        entry = self.imageModel.entry(self.cntr)
+        if entry is None:
             return
-        if os.path.exists(self.currentImgs[self.cntr]['path']):
-            self.image_viewer.loadImage(self.currentImgs[self.cntr]['path'])
+        if os.path.exists(entry['path']):
+            self.image_viewer.loadImage(entry['path'])
         else:
             self.image_viewer.loadImage(f"{DIR}/icons/noShowDetails.png")
 
+    def closeEvent(self, e):
+        if self.session is not None:
+            self.session.close()
+        if self.scenes is not None:
+            self.scenes.cancel()
+        if self.writer is not None:
+            self.writer.close()
+        self.thumbs.close()
+        super(Iwindow, self).closeEvent(e)
+
     def keyPressEvent(self, e):
         if e.key()  == QtCore.Qt.Key_P:
             self.delete_img()
@@ -469,23 +635,68 @@ class Iwindow(QtWidgets.QMainWindow, gui):
             self.prevFrame()
         if e.key()  == QtCore.Qt.Key_S and self.locked:
             self.saveFrame()
+        if e.key()  == QtCore.Qt.Key_BracketLeft:
+            self.startRange()
+        if e.key()  == QtCore.Qt.Key_BracketRight:
+            self.endRange()
 
     def goToFrame(self):
         if not self.videoLoaded:
             return
         jumpTo = int(self.selectFrame.text())
         if jumpTo >= 0 and jumpTo < self.vidlength:
-            self.videoFrameCount = jumpTo
-            self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
-            self.loadVideoFrame()
-            self.update_labels()
+            self.seekTo(jumpTo, int(self.videoJump.text()))
+
+    def seekTo(self, frame, jump=None):
+        if not self.videoLoaded or frame == self.videoFrameCount:
+            return
+        self.videoFrameCount = frame
+        self.frameNum.setText(f"{self.videoFrameCount}/{self.vidlength}")
+        self.loadVideoFrame(jump)
+        self.update_labels()
+
+    def startRange(self):
+        ''' Start a label range at the current frame, ended by endRange. '''
+        if not self.videoLoaded:
+            return
+        self.rangeStart = self.videoFrameCount
+        self.seekBar.setMark(self.rangeStart)
+        self.statusbar.showMessage(f"Range started at frame {self.rangeStart}, go to its last frame and press ] to label it")
+
+    def endRange(self):
+        ''' Give the frames from the range start to the current frame the label values typed in
+            the label list, 0 taking a label off them.
+        '''
+        if self.rangeStart is None:
+            return
+        if self.timeline is None:
+            self.statusbar.showMessage("Open a dataset folder to keep label ranges in")
+            return
+        start, end = sorted((self.rangeStart, self.videoFrameCount))
+        for i in range(self.dataset.nlabels):
+            item = self.ls_labels.itemWidget(self.ls_labels.item(i))
+            try:
+                v = int(item.currentAddText.text().strip() or 0)
+            except ValueError:
+                continue
+            self.timeline.set(item.name, start, end + 1, v)
+        self.timelines.save()
+        self.settleFolder()
+        self.rangeStart = None
+        self.seekBar.setMark(None)
+        self.seekBar.refresh()
+        self.statusbar.showMessage(f"Labelled frames {start}-{end} of {self.videoName}")
 
     def update_labels(self):
+        ''' Pre-fill the label values of the current frame: the labels it was saved with, or else
+            those of the label ranges it is in.
+        '''
+        if self.dataset is None:
+            return
         idx = self.videoFrameCount
-        fname = "frame"+str(idx)
-        labels = {}
-        if fname in self.dataset.frames.keys():
-            labels = self.dataset.frames[fname]
+        labels = self.dataset.frames.get(frameName(self.videoName, idx))
+        if labels is None:
+            labels = self.timeline.labelsAt(idx) if self.timeline is not None else {}
         for i in range(self.dataset.nlabels):
             item = self.ls_labels.itemWidget(self.ls_labels.item(i))
             
@@ -498,6 +709,9 @@ def main():
     app.setStyle(QtWidgets.QStyleFactory.create("Cleanlooks"))
     app.setPalette(QtWidgets.QApplication.style().standardPalette())
     parentWindow = Iwindow(None)
+    if len(sys.argv) > 1:
+        # python vfs.py [dataset folder]: read once the window is up
+        parentWindow.openFolder(sys.argv[1])
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+import numpy as np
+import cv2
+from sidecar import sidecarPath, readSidecar, writeSidecar
+
+
+class VideoIndex:
+    ''' Per-frame presentation timestamps (seconds from the first frame) and keyframe
+        positions of a video, in presentation order. count is the true number of frames,
+        which CAP_PROP_FRAME_COUNT only estimates.
+    '''
+    def __init__(self, pts, keyframes):
+        self.pts = pts
+        self.keyframes = keyframes
+        self.count = len(pts)
+        duration = pts[-1] - pts[0] if self.count > 1 else 0
+        self.fps = (self.count - 1) / duration if duration > 0 else 0.0
+
+    def keyframeBefore(self, idx):
+        ''' Index of the last keyframe at or before frame idx. '''
+        i = np.searchsorted(self.keyframes, idx, side="right")
+        return int(self.keyframes[i - 1]) if i > 0 else 0
+
+    def frameAt(self, seconds):
+        ''' Index of the frame whose timestamp is closest to seconds. '''
+        i = int(np.searchsorted(self.pts, seconds))
+        if i >= self.count:
+            return self.count - 1
+        if i > 0 and seconds - self.pts[i - 1] < self.pts[i] - seconds:
+            return i - 1
+        return i
+
+    def time(self, idx):
+        return float(self.pts[idx])
+
+
+def buildIndex(path):
+    ''' Scan the packets of path without decoding them (OpenCV raw stream mode). Returns None
+        when the backend cannot report keyframes.
+    '''
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    cap = cv2.VideoCapture(path, cv2.CAP_FFMPEG)
+    if not cap.isOpened() or not cap.set(cv2.CAP_PROP_FORMAT, -1):
+        cap.release()
+        return None
+    pts, key = [], []
+    while cap.grab():
+        pts.append(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+        key.append(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) != 0)
+    cap.release()
+    if not pts:
+        return None
+    # packets come in decode order; with B-frames that differs from presentation order
+    pts, key = np.array(pts), np.array(key)
+    order = np.argsort(pts, kind="stable")
+    pts = pts[order] - pts[order[0]]
+    keyframes = np.flatnonzero(key[order])
+    return VideoIndex(pts, keyframes)
+
+
+def loadIndex(path):
+    ''' Index of the video at path, read from its sidecar or built and saved on first use. '''
+    sidecar = sidecarPath(path, "index")
+    saved = readSidecar(sidecar, "pts", "keyframes")
+    if saved is not None:
+        return VideoIndex(*saved)
+    index = buildIndex(path)
+    if index is not None:
+        writeSidecar(sidecar, pts=index.pts, keyframes=index.keyframes)
+    return index
@@ -1,8 +1,22 @@
 from PyQt5.QtGui import QImage, QPixmap, QPainter
 from PyQt5 import QtCore, QtGui
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PIL.ImageQt import ImageQt
+from timing import timed
 
+MAX_LEVELS = 4      # number of zoom levels whose scaled pixmap is kept around
+
+
+def arrayToQImage(array, bgr=False):
+    ''' Wrap a C-contiguous uint8 ndarray as a QImage sharing its buffer (no copy). '''
+    h, w = array.shape[:2]
+    channels = 1 if array.ndim == 2 else array.shape[2]
+    if channels == 1:
+        fmt = QImage.Format_Grayscale8
+    elif channels == 3:
+        fmt = QImage.Format_BGR888 if bgr else QImage.Format_RGB888
+    else:
+        fmt = QImage.Format_ARGB32 if bgr else QImage.Format_RGBA8888
+    return QImage(array.data, w, h, array.strides[0], fmt)
 
 
 class ImageViewer:
@@ -11,57 +25,111 @@ class ImageViewer:
     '''
     def __init__(self, qlabel):
         self.qlabel_image = qlabel                            # widget/window name where image is displayed (I'm usiing qlabel)
-        self.qimage_scaled = QImage()                         # scaled image to fit to the size of qlabel_image
+        self.qimage = QImage()                                # full resolution source (may wrap self.array)
+        self.array = None                                     # full resolution ndarray source, if loaded with loadArray
+        self.bgr = False
+        self.levels = {}                                      # zoom factor -> QPixmap of the source scaled for that zoom
+        self.qpixmap_scaled = QPixmap()                       # scaled pixmap for the current zoom, panning blits from it
         self.qpixmap = QPixmap()                              # qpixmap to fill the qlabel_image
 
         self.zoomX = 1              # zoom factor w.r.t size of qlabel_image
-        self.position = [0, 0]      # position of top left corner of qimage_label w.r.t. qimage_scaled
+        self.position = [0, 0]      # position of top left corner of qimage_label w.r.t. qpixmap_scaled
         self.panFlag = False        # to enable or disable pan
 
         self.qlabel_image.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
 
+    @timed("viewer.loadImage")
     def loadImage(self, imagePath):
         ''' To load and display new image.'''
+        self.array = None
         self.qimage = QImage(imagePath)
         self.update_image()
 
+    @timed("viewer.loadImagePIL")
     def loadImagePIL(self,image):
+        from PIL.ImageQt import ImageQt     # PIL is only loaded if a PIL image is ever shown
+        self.array = None
         self.qimage = ImageQt(image)
         self.update_image()
 
+    def loadArray(self, array, bgr=False):
+        ''' To display an ndarray (HxW, HxWx3 or HxWx4, uint8) without copying it.
+            The array is only resized (INTER_AREA) to the display size, colour order is
+            handled by the QImage format, so pass bgr=True for frames straight from OpenCV.
+            The array is kept referenced here and must not be modified while displayed.
+        '''
+        import numpy as np                  # already loaded by whoever made the array
+        if array.dtype != np.uint8:
+            array = array.astype(np.uint8)
+        if not array.flags["C_CONTIGUOUS"]:
+            array = np.ascontiguousarray(array)
+        self.array, self.bgr = array, bgr
+        self.qimage = arrayToQImage(array, bgr)
+        self.update_image()
+
+    @timed("viewer.scale")
+    def scaledPixmap(self, zoom):
+        ''' Pixmap of the source fitted to qlabel_image and multiplied by zoom, cached per zoom level. '''
+        if zoom in self.levels:
+            return self.levels[zoom]
+        size = self.qimage.size().scaled(int(self.qlabel_image.width() * zoom), int(self.qlabel_image.height() * zoom), QtCore.Qt.KeepAspectRatio)
+        if self.array is not None and size.width() < self.qimage.width():
+            # shrink the ndarray before it ever becomes a QImage/QPixmap
+            import cv2
+            small = cv2.resize(self.array, (max(size.width(), 1), max(size.height(), 1)), interpolation=cv2.INTER_AREA)
+            pixmap = QPixmap.fromImage(arrayToQImage(small, self.bgr))
+        else:
+            pixmap = QPixmap.fromImage(self.qimage.scaled(size, QtCore.Qt.KeepAspectRatio))
+        if len(self.levels) >= MAX_LEVELS:
+            self.levels.pop(next(iter(self.levels)))
+        self.levels[zoom] = pixmap
+        return pixmap
+
+    @timed("viewer.update_image")
     def update_image(self):
-        self.qpixmap = QPixmap(self.qlabel_image.size())
+        if self.qpixmap.size() != self.qlabel_image.size():
+            self.qpixmap = QPixmap(self.qlabel_image.size())
+        self.levels = {}
         if not self.qimage.isNull():
             # reset Zoom factor and Pan position
             self.zoomX = 1
             self.position = [0, 0]
-            self.qimage_scaled = self.qimage.scaled(self.qlabel_image.width(), self.qlabel_image.height(), QtCore.Qt.KeepAspectRatio)
+            self.qpixmap_scaled = self.scaledPixmap(self.zoomX)
             self.update()
-    
+
+    def setZoom(self, zoomX):
+        ''' Change the zoom factor, reusing the cached pixmap for that level if there is one. '''
+        if self.qimage.isNull():
+            return
+        self.zoomX = zoomX
+        self.qpixmap_scaled = self.scaledPixmap(zoomX)
+        self.update()
+
+    @timed("viewer.update")
     def update(self):
         ''' This function actually draws the scaled image to the qlabel_image.
             It will be repeatedly called when zooming or panning.
             So, I tried to include only the necessary operations required just for these tasks. 
         '''
-        if not self.qimage_scaled.isNull():
+        if not self.qpixmap_scaled.isNull():
             # check if position is within limits to prevent unbounded panning.
             px, py = self.position
-            px = px if (px <= self.qimage_scaled.width() - self.qlabel_image.width()) else (self.qimage_scaled.width() - self.qlabel_image.width())
-            py = py if (py <= self.qimage_scaled.height() - self.qlabel_image.height()) else (self.qimage_scaled.height() - self.qlabel_image.height())
+            px = px if (px <= self.qpixmap_scaled.width() - self.qlabel_image.width()) else (self.qpixmap_scaled.width() - self.qlabel_image.width())
+            py = py if (py <= self.qpixmap_scaled.height() - self.qlabel_image.height()) else (self.qpixmap_scaled.height() - self.qlabel_image.height())
             px = px if (px >= 0) else 0
             py = py if (py >= 0) else 0
             self.position = (px, py)
 
-            if self.zoomX == 1:
+            if self.qpixmap_scaled.width() < self.qpixmap.width() or self.qpixmap_scaled.height() < self.qpixmap.height():
                 self.qpixmap.fill(QtCore.Qt.white)
 
-            # the act of painting the qpixamp
+            # the act of painting the qpixamp, a plain blit from the cached scaled pixmap
             painter = QPainter()
             painter.begin(self.qpixmap)
-            painter.drawImage(QtCore.QPoint(0, 0), self.qimage_scaled,
+            painter.drawPixmap(QtCore.QPoint(0, 0), self.qpixmap_scaled,
                     QtCore.QRect(self.position[0], self.position[1], self.qlabel_image.width(), self.qlabel_image.height()) )
             painter.end()
 
             self.qlabel_image.setPixmap(self.qpixmap)
         else:
-            pass
\ No newline at end of file
+            pass
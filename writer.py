@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from timing import timed
+from dataset import atomicWrite
+
+WORKERS = 4         # encoder threads, cv2.imencode releases the GIL
+MAX_PENDING = 32    # frames queued or being written before submit() blocks
+
+
+def encodeParams(ext, quality):
+    ext = ext.lower()
+    if ext in ("jpg", "jpeg"):
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if ext == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if ext == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, 3]
+    raise ValueError(f"Unsupported frame format: {ext}")
+
+
+class FrameWriter:
+    ''' Encodes and writes frames on a thread pool so saving never blocks the GUI.
+        Frames are BGR as decoded by OpenCV. done(path, ok) is called once a file has
+        landed on disk (or failed), from the worker thread, or from the thread calling
+        submit() when the write finished before it returned; files are written to a
+        temporary name and renamed, so a half-written image is never picked up.
+    '''
+    def __init__(self, ext="jpg", quality=95, workers=WORKERS, maxPending=MAX_PENDING, done=None):
+        self.ext = ext.lower()
+        self.params = encodeParams(self.ext, quality)
+        self.done = done
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-writer")
+        self.slots = threading.BoundedSemaphore(maxPending)
+        self.cond = threading.Condition()
+        self.pending = 0
+
+    def submit(self, path, frame):
+        ''' Queue frame to be written to path, blocking only if MAX_PENDING writes are in flight. '''
+        self.slots.acquire()
+        with self.cond:
+            self.pending += 1
+        future = self.pool.submit(self._write, path, frame)
+        future.add_done_callback(lambda f: self._finished(path, f))
+
+    @timed("writer.write")
+    def _write(self, path, frame):
+        ok, buf = cv2.imencode(f".{self.ext}", frame, self.params)
+        if not ok:
+            raise IOError(f"Could not encode {path}")
+        atomicWrite(path, buf)
+
+    def _finished(self, path, future):
+        ok = future.exception() is None
+        if not ok:
+            print(f"Error writing {path}: {future.exception()}")
+        self.slots.release()
+        with self.cond:
+            self.pending -= 1
+            self.cond.notify_all()
+        if self.done is not None:
+            self.done(path, ok)
+
+    def flush(self, timeout=None):
+        ''' Wait until every queued frame has been written. '''
+        with self.cond:
+            return self.cond.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown(wait=True)